@@ -1,7 +1,9 @@
+import os
 import dash
 from dash import Dash, html
 import dash_bootstrap_components as dbc
 from cache_config import server, cache
+from utils.warmer import start_cache_warmer
 
 app = Dash(__name__, 
            server=server,
@@ -34,5 +36,9 @@ content = html.Div(
 
 app.layout = html.Div([sidebar, content])
 
+# Keeps the market and sector symbols warm in the background, set CACHE_WARMER=0 to turn it off
+if os.environ.get('CACHE_WARMER', '1') != '0':
+    start_cache_warmer()
+
 if __name__ == '__main__':
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,377 @@
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# The in-process server runs on generated data in a throwaway store, without the background warmer
+os.environ.setdefault('DATA_PROVIDER', 'synthetic')
+os.environ.setdefault('STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='dashboard-load-'), 'market_data.db'))
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import numpy as np
+
+# Pages a simulated user visits, picked with equal weight
+pages = ['/', '/portfolio', '/market', '/sectors']
+
+# Symbols a simulated user builds a portfolio or picks a chart from
+user_symbols = ['AAPL', 'AMZN', 'GOOGL', 'META', 'MSFT', 'NVDA', 'TSLA', 'JPM', 'KO', 'XOM', 'RY.TO', 'SHOP.TO']
+
+# Requests a browser keeps open to one host at a time
+BROWSER_CONNECTIONS = 6
+
+"""
+Browser simulation
+"""
+
+# Splits a Dash output string into its (id, property) pairs, several outputs are written as ..a.prop...b.prop..
+def parse_outputs(output):
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [tuple(part.rsplit('.', 1)) for part in parts]
+
+# Short name of a callback for reports: its first output and how many more it has
+def get_callback_name(outputs):
+    name = '.'.join(outputs[0])
+    return f'{name} (+{len(outputs) - 1})' if len(outputs) > 1 else name
+
+# One user's browser tab: keeps the props of every rendered component and fires callbacks the way the Dash renderer does,
+# waiting for a callback's inputs to settle, sending independent callbacks in parallel and following chained outputs
+class Session:
+    def __init__(self, url, dependencies, layout, recorder, rng):
+        self.url = url
+        self.recorder = recorder
+        self.rng = rng
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS)
+
+        self.callbacks = []
+        for dependency in dependencies:
+            # Clientside callbacks run in the browser and never reach the server
+            if dependency.get('clientside_function'):
+                continue
+            self.callbacks.append({'output': dependency['output'],
+                                   'outputs': parse_outputs(dependency['output']),
+                                   'inputs': [(i['id'], i['property']) for i in dependency['inputs']],
+                                   'state': [(s['id'], s['property']) for s in dependency['state']],
+                                   'prevent_initial_call': dependency.get('prevent_initial_call', False)})
+
+        self.layout = layout
+        self.reset()
+
+    # Forgets every component, as if the tab was reloaded
+    def reset(self):
+        self.props = {}  # (id, property) to value
+        self.types = {}  # id to component type
+        self.owner = {}  # id to the id whose children it was rendered in
+        self.children = defaultdict(set)
+
+    # Registers every component with an id inside a layout fragment, returns the new ids
+    def add_components(self, node, owner=None):
+        new_ids = set()
+
+        if isinstance(node, list):
+            for child in node:
+                new_ids |= self.add_components(child, owner)
+        elif isinstance(node, dict) and 'props' in node:
+            component_id = node['props'].get('id')
+            if isinstance(component_id, str):
+                self.types[component_id] = node.get('type')
+                self.owner[component_id] = owner
+                self.children[owner].add(component_id)
+                for prop, value in node['props'].items():
+                    self.props[(component_id, prop)] = value
+                new_ids.add(component_id)
+                owner = component_id
+
+            for value in node['props'].values():
+                new_ids |= self.add_components(value, owner)
+
+        return new_ids
+
+    # Drops every component rendered inside a component's children
+    def remove_descendants(self, component_id):
+        for child in list(self.children.pop(component_id, ())):
+            self.remove_descendants(child)
+            self.types.pop(child, None)
+            self.owner.pop(child, None)
+            for key in [key for key in self.props if key[0] == child]:
+                del self.props[key]
+
+    # Callbacks a change sets off: those reading a changed prop, and those whose inputs or outputs just appeared unless they opt out
+    def get_triggered(self, changed, new_ids, source=None):
+        triggered = {}
+        for index, cb in enumerate(self.callbacks):
+            if index == source or not all(i[0] in self.types for i in cb['inputs']):
+                continue
+            if not all(o[0] in self.types for o in cb['outputs']):
+                continue
+
+            changed_inputs = [i for i in cb['inputs'] if i in changed]
+            appeared = any(key[0] in new_ids for key in cb['inputs'] + cb['outputs'])
+            initial = appeared and not cb['prevent_initial_call']
+            if changed_inputs or initial:
+                triggered[index] = changed_inputs
+
+        return triggered
+
+    # Sends one callback request and applies its response, returns the props it changed and components it added
+    def fire(self, index, changed_inputs):
+        cb = self.callbacks[index]
+        payload = {'output': cb['output'],
+                   'outputs': [{'id': i, 'property': p} for i, p in cb['outputs']],
+                   'inputs': [{'id': i, 'property': p, 'value': self.props.get((i, p))} for i, p in cb['inputs']],
+                   'changedPropIds': [f'{i}.{p}' for i, p in changed_inputs],
+                   'state': [{'id': i, 'property': p, 'value': self.props.get((i, p))} for i, p in cb['state']]}
+        if len(cb['outputs']) == 1:
+            payload['outputs'] = payload['outputs'][0]
+
+        request = urllib.request.Request(self.url + '/_dash-update-component', data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, body = error.code, b''
+        except OSError:
+            status, body = 0, b''
+        self.recorder.record_request(get_callback_name(cb['outputs']), time.perf_counter() - start, status, len(body))
+
+        # 204 means the callback raised PreventUpdate
+        if status != 200 or not body:
+            return index, set(), set()
+
+        changed, new_ids = set(), set()
+        for component_id, values in json.loads(body).get('response', {}).items():
+            for prop, value in values.items():
+                if prop == 'children':
+                    self.remove_descendants(component_id)
+                    new_ids |= self.add_components(value, component_id)
+                self.props[(component_id, prop)] = value
+                changed.add((component_id, prop))
+
+        return index, changed, new_ids
+
+    # Runs callbacks until nothing more is triggered, a callback waits while another pending one still writes to its inputs
+    def settle(self, pending):
+        while pending:
+            writes = {index: set(self.callbacks[index]['outputs']) for index in pending}
+            ready = [index for index in pending
+                     if not any(set(self.callbacks[index]['inputs']) & writes[other] for other in pending if other != index)]
+            ready = ready or list(pending)
+
+            futures = [self.pool.submit(self.fire, index, pending.pop(index)) for index in ready]
+            for future in futures:
+                index, changed, new_ids = future.result()
+                for triggered, changed_inputs in self.get_triggered(changed, new_ids, source=index).items():
+                    pending[triggered] = sorted(set(pending.get(triggered, [])) | set(changed_inputs))
+
+    # Opens a page the way a browser does: renders the app layout, then the router callback renders the page
+    def load_page(self, path):
+        self.reset()
+        new_ids = self.add_components(self.layout)
+        self.props[('_pages_location', 'pathname')] = path
+        self.props[('_pages_location', 'search')] = ''
+
+        start = time.perf_counter()
+        self.settle(self.get_triggered({('_pages_location', 'pathname')}, new_ids))
+        self.recorder.record_action('page load', time.perf_counter() - start)
+
+    # Gets the controls a user can change on the current page: dropdowns and tabs feeding a server callback
+    def get_controls(self):
+        inputs = {i for cb in self.callbacks for i in cb['inputs']}
+        return sorted(key for key in inputs if key[0] in self.types and self.types[key[0]] in ('Dropdown', 'Tabs')
+                      and not key[0].startswith('_'))
+
+    # Picks a new value for a control, a random portfolio for multi-select dropdowns
+    def pick_value(self, component_id):
+        if self.types[component_id] == 'Tabs':
+            tabs = [tab['props'].get('tab_id') for tab in self.props.get((component_id, 'children')) or []
+                    if isinstance(tab, dict) and 'props' in tab]
+            choices = [tab for tab in tabs if tab is not None and tab != self.props.get((component_id, 'active_tab'))]
+            return self.rng.choice(choices) if choices else None
+
+        options = self.props.get((component_id, 'options')) or []
+        values = [option['value'] if isinstance(option, dict) else option for option in options]
+
+        if self.props.get((component_id, 'multi')):
+            symbols = [symbol for symbol in user_symbols if symbol in set(values)] or values[:20]
+            return self.rng.sample(symbols, min(len(symbols), self.rng.randint(2, 5)))
+
+        current = self.props.get((component_id, 'value'))
+        choices = [value for value in values if value != current]
+        return self.rng.choice(choices) if choices else None
+
+    # Changes one control on the current page and waits for everything it sets off
+    def change_control(self):
+        controls = self.get_controls()
+        if not controls:
+            return
+
+        component_id, prop = self.rng.choice(controls)
+        value = self.pick_value(component_id)
+        if value is None:
+            return
+
+        self.props[(component_id, prop)] = value
+        start = time.perf_counter()
+        self.settle(self.get_triggered({(component_id, prop)}, set()))
+        self.recorder.record_action(f'change {component_id}', time.perf_counter() - start)
+
+"""
+Recording
+"""
+
+# Collects request and action latencies from every session
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(list)  # Callback name to latencies
+        self.actions = defaultdict(list)  # Action name to latencies
+        self.errors = defaultdict(int)  # Callback name to failed requests
+        self.bytes = 0
+
+    def record_request(self, name, latency, status, size):
+        with self.lock:
+            self.requests[name].append(latency)
+            self.bytes += size
+            if status not in (200, 204):
+                self.errors[name] += 1
+
+    def record_action(self, name, latency):
+        with self.lock:
+            self.actions[name].append(latency)
+
+# Gets the count and p50/p95/p99 in milliseconds of a list of latencies
+def summarize(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (0, 0, 0)
+    return {'count': len(latencies), 'p50': p50, 'p95': p95, 'p99': p99}
+
+"""
+Load generation
+"""
+
+# Fetches what the Dash renderer loads before anything else: the callback graph and the app layout
+def get_app_spec(url):
+    with urllib.request.urlopen(url + '/_dash-dependencies', timeout=30) as response:
+        dependencies = json.load(response)
+    with urllib.request.urlopen(url + '/_dash-layout', timeout=30) as response:
+        layout = json.load(response)
+    return dependencies, layout
+
+# One simulated user: visits random pages and changes a few controls on each, pausing between steps
+def run_user(url, spec, recorder, seed, deadline, actions, think):
+    rng = random.Random(seed)
+    session = Session(url, *spec, recorder, rng)
+
+    try:
+        while time.monotonic() < deadline:
+            session.load_page(rng.choice(pages))
+            for _ in range(actions):
+                if think:
+                    time.sleep(rng.expovariate(1 / think))
+                if time.monotonic() >= deadline:
+                    break
+                session.change_control()
+    finally:
+        session.pool.shutdown()
+
+# Runs a number of simultaneous users for a while and returns what they recorded
+def run_level(url, spec, concurrency, duration, actions, think, seed=0):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    start = time.perf_counter()
+    users = [threading.Thread(target=run_user, args=(url, spec, recorder, seed * 1000 + i, deadline, actions, think))
+             for i in range(concurrency)]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.perf_counter() - start
+
+    all_requests = [latency for latencies in recorder.requests.values() for latency in latencies]
+    all_actions = [latency for latencies in recorder.actions.values() for latency in latencies]
+
+    return {'concurrency': concurrency,
+            'elapsed': elapsed,
+            'throughput': len(all_requests) / elapsed,
+            'actions_per_second': len(all_actions) / elapsed,
+            'errors': sum(recorder.errors.values()),
+            'megabytes': recorder.bytes / 1e6,
+            'requests': summarize(all_requests),
+            'actions': summarize(all_actions),
+            'callbacks': {name: {**summarize(latencies), 'errors': recorder.errors[name]}
+                          for name, latencies in recorder.requests.items()},
+            'action_types': {name: summarize(latencies) for name, latencies in recorder.actions.items()}}
+
+# Starts the dashboard on a threaded local server, the way a single instance of app.py serves requests
+def start_server():
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+"""
+Reporting
+"""
+
+def print_level(result):
+    requests, actions = result['requests'], result['actions']
+    print(f"{result['concurrency']:>6}{requests['count']:>9}{result['throughput']:>10.1f}{result['actions_per_second']:>10.2f}"
+          f"{requests['p50']:>10.1f}{requests['p95']:>10.1f}{requests['p99']:>10.1f}"
+          f"{actions['p50']:>10.1f}{actions['p95']:>10.1f}{actions['p99']:>10.1f}{result['errors']:>8}")
+
+def print_breakdown(result):
+    print(f"\nPer callback at {result['concurrency']} users (ms)")
+    print(f"{'callback':<58}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for name, stats in sorted(result['callbacks'].items(), key=lambda item: -item[1]['p95']):
+        print(f"{name:<58}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}{stats['errors']:>8}")
+
+    print(f"\n{'action':<58}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in sorted(result['action_types'].items()):
+        print(f"{name:<58}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load tests the Dash callback endpoints with simulated users')
+    parser.add_argument('--url', help='test a running instance instead of starting one in process')
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='comma separated numbers of simultaneous users')
+    parser.add_argument('--duration', type=float, default=30, help='seconds each concurrency level runs for')
+    parser.add_argument('--actions', type=int, default=3, help='control changes per page visit')
+    parser.add_argument('--think', type=float, default=0, help='mean seconds a user pauses between steps')
+    parser.add_argument('--warmup', type=float, default=10, help='seconds of a single user before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write every result as JSON to this path')
+    args = parser.parse_args()
+
+    url = (args.url or start_server()).rstrip('/')
+    spec = get_app_spec(url)
+
+    if args.warmup:
+        run_level(url, spec, 1, args.warmup, args.actions, 0, seed=args.seed)
+
+    print(f"{'users':>6}{'requests':>9}{'req/s':>10}{'act/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+          f"{'act p50':>10}{'act p95':>10}{'act p99':>10}{'errors':>8}")
+
+    results = []
+    for concurrency in (int(level) for level in args.concurrency.split(',')):
+        results.append(run_level(url, spec, concurrency, args.duration, args.actions, args.think, seed=args.seed))
+        print_level(results[-1])
+
+    print_breakdown(results[-1])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+# Benchmarks never touch Yahoo or the real store, the data layer runs on generated data in a throwaway database
+os.environ.setdefault('DATA_PROVIDER', 'synthetic')
+os.environ.setdefault('STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='dashboard-bench-'), 'market_data.db'))
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_bars, make_close_panel, get_symbols
+from cache_config import server
+from utils import data, tech, streaming
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# A median this much slower than the baseline counts as a regression
+REGRESSION_THRESHOLD = 0.10
+
+"""
+Benchmark cases
+"""
+
+# Intraday windows the VWAP functions run on, from a single session up to Yahoo's whole 5 minute history
+intraday_sizes = [('5m', '1d'), ('5m', '5d'), ('5m', '1mo'), ('5m', '2mo'), ('60m', '2y')]
+
+# Daily windows for the rolling statistics and volume profile
+daily_sizes = [('1d', '1y'), ('1d', '5y'), ('1d', '10y')]
+
+# Ticker counts and windows of the close panels on the portfolio page
+panel_sizes = [(10, '1y'), (100, '5y'), (500, '5y')]
+
+# Dropdown labels matching each interval code, the rolling volatility annualizes by label
+interval_labels = {'5m': '5 Minutes', '60m': '1 Hour', '1d': '1 Day'}
+
+# Every case as (function name, size label, setup), setup builds the inputs and returns the call to time
+def get_cases():
+    cases = []
+
+    for interval_code, period_code in intraday_sizes:
+        size = f'{interval_code} x {period_code}'
+
+        def vwap(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            return len(bars), lambda: tech.get_intraday_vwap(bars)
+
+        def events(interval_code=interval_code, period_code=period_code):
+            vwap_df = tech.get_intraday_vwap(make_bars('AAPL', interval_code, period_code))
+            return len(vwap_df), lambda: tech.detect_vwap_events(vwap_df)
+
+        # A live refresh: the engine already holds the window and the last bar keeps being revised
+        def stream(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            revised = bars.copy()
+            revised.iloc[-1, revised.columns.get_loc('Close')] *= 1.001
+            engine = streaming.StreamingVWAP()
+            engine.update(bars)
+            frames = itertools.cycle([revised, bars])
+            return len(bars), lambda: engine.update(next(frames))
+
+        # A repeat view: fingerprinting the bars and reading the cached result
+        def cached_vwap(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            data.get_indicator(tech.get_intraday_vwap, bars)
+            return len(bars), lambda: data.get_indicator(tech.get_intraday_vwap, bars)
+
+        cases += [('get_intraday_vwap', size, vwap), ('detect_vwap_events', size, events),
+                  ('StreamingVWAP.update', size, stream), ('get_indicator', f'{size} hit', cached_vwap)]
+
+    for interval_code, period_code in intraday_sizes + daily_sizes:
+        size = f'{interval_code} x {period_code}'
+
+        def profile(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            return len(bars), lambda: tech.get_volume_profile(bars)
+
+        def profile_range(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            return len(bars), lambda: tech.get_volume_profile(bars, distribute=True)
+
+        def profile_info(interval_code=interval_code, period_code=period_code):
+            profile_df = tech.get_volume_profile(make_bars('AAPL', interval_code, period_code))
+            return len(profile_df), lambda: tech.get_profile_info(profile_df)
+
+        def volatility(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            return len(bars), lambda: tech.get_realized_volatility(bars, interval_labels[interval_code])
+
+        def beta(interval_code=interval_code, period_code=period_code):
+            bars = make_bars('AAPL', interval_code, period_code)
+            benchmark = make_bars('^GSPC', interval_code, period_code)
+            return len(bars), lambda: tech.get_rolling_beta(bars, benchmark)
+
+        cases += [('get_volume_profile', size, profile), ('get_volume_profile', f'{size} distributed', profile_range),
+                  ('get_profile_info', size, profile_info),
+                  ('get_realized_volatility', size, volatility), ('get_rolling_beta', size, beta)]
+
+    for ticker_count, period_code in panel_sizes:
+        size = f'{ticker_count} tickers x {period_code}'
+
+        def weekly_close(ticker_count=ticker_count, period_code=period_code):
+            panel = make_close_panel(ticker_count, period_code)
+            return panel.size, lambda: data.get_weekly_close(panel)
+
+        def panel_volatility(ticker_count=ticker_count, period_code=period_code):
+            panel = make_close_panel(ticker_count, period_code)
+            return panel.size, lambda: tech.get_panel_volatility(panel, '1 Day')
+
+        def panel_beta(ticker_count=ticker_count, period_code=period_code):
+            panel = make_close_panel(ticker_count, period_code)
+            benchmark = make_bars('^GSPC', '1d', period_code)
+            return panel.size, lambda: tech.get_panel_beta(panel, benchmark)
+
+        cases += [('get_weekly_close', size, weekly_close), ('get_panel_volatility', size, panel_volatility),
+                  ('get_panel_beta', size, panel_beta)]
+
+    # The summary table as a repeat page load sees it, the bars already fetched. They are built as of BENCHMARK_NOW
+    # rather than read through the data layer, which cuts periods by the wall clock
+    for ticker_count, period_code, interval_code in [(10, '1y', '1d'), (100, '1y', '1d'), (10, '1mo', '5m')]:
+        size = f'{ticker_count} tickers x {period_code} x {interval_code}'
+
+        def summary(ticker_count=ticker_count, period_code=period_code, interval_code=interval_code):
+            tickers = get_symbols(ticker_count)
+            shares = {ticker: 10 for ticker in tickers}
+            frames = {ticker: make_bars(ticker, interval_code, period_code) for ticker in tickers}
+            metadata = data.get_ticker_metadata(tickers)
+            return ticker_count, lambda: data.build_summary_table(tickers, shares, frames, metadata, True)
+
+        cases.append(('build_summary_table', size, summary))
+
+    return cases
+
+"""
+Timing
+"""
+
+# Times a call: enough loops to run for about 0.2 seconds, repeated to take the median and best time per call
+def time_call(func, repeat=5):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'median': statistics.median(times), 'min': min(times), 'number': number, 'repeat': repeat}
+
+# Runs every case whose name contains a filter and returns the results keyed by case
+def run_cases(name_filter=None, repeat=5):
+    results = {}
+    for name, size, setup in get_cases():
+        if name_filter and name_filter not in name:
+            continue
+
+        rows, func = setup()
+        result = {'function': name, 'size': size, 'rows': int(rows), **time_call(func, repeat)}
+        results[f'{name}[{size}]'] = result
+
+        print(f"{name:<26}{size:<36}{rows:>10}{result['median'] * 1000:>12.3f} ms")
+
+    return results
+
+# Gets the current git commit, with a marker when the tree has uncommitted changes
+def get_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+# Writes a run to the results directory under its label, returns the file path
+def save_results(results, label):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{label}.json')
+
+    with open(path, 'w') as f:
+        json.dump({'label': label,
+                   'version': get_version(),
+                   'created': pd.Timestamp.now(tz='UTC').isoformat(),
+                   'python': platform.python_version(),
+                   'pandas': pd.__version__,
+                   'numpy': np.__version__,
+                   'results': results}, f, indent=2)
+
+    return path
+
+"""
+Comparison
+"""
+
+# Loads a saved run from a path or a label in the results directory
+def load_results(name):
+    path = name if os.path.exists(name) else os.path.join(RESULTS_DIR, f'{name}.json')
+    with open(path) as f:
+        return json.load(f)
+
+# Prints the change in median time of every case two runs share, returns the cases that got slower than the threshold
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    print(f"{'case':<64}{baseline['label']:>14}{current['label']:>14}{'change':>10}")
+
+    regressions = []
+    for case, result in current['results'].items():
+        base = baseline['results'].get(case)
+        if base is None:
+            continue
+
+        change = result['median'] / base['median'] - 1
+        flag = '  slower' if change > threshold else ''
+        if change > threshold:
+            regressions.append(case)
+
+        print(f"{case:<64}{base['median'] * 1000:>11.3f} ms{result['median'] * 1000:>11.3f} ms{change:>+10.1%}{flag}")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the analytics and data hot paths on synthetic data')
+    parser.add_argument('--label', help='name the results are saved under, defaults to the git version')
+    parser.add_argument('--filter', help='only run functions whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two saved runs instead of running, by label or path')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_results(*(load_results(name) for name in args.compare), threshold=args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    with server.app_context():
+        results = run_cases(args.filter, args.repeat)
+
+    print(f"Saved to {save_results(results, args.label or get_version())}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import pandas as pd
+from utils.config import ticker_df
+from utils.providers import make_synthetic_bars
+
+# Every dataset is built as of the same close, so results don't depend on the day the benchmark runs
+BENCHMARK_NOW = pd.Timestamp('2026-10-16 16:00', tz='America/New_York')
+
+# Gets bars of one ticker, columns and timezone exactly as the data layer hands them to utils/tech.py
+def make_bars(ticker, interval_code, period_code):
+    bars = make_synthetic_bars(ticker, interval_code, period_code, now=BENCHMARK_NOW)
+    return bars[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+# Gets a number of US listed symbols, the same ones on every run
+def get_symbols(count):
+    symbols = ticker_df.loc[ticker_df['Country'] == 'US', 'Symbol'].dropna()
+    return symbols[~symbols.str.contains(r'[\^$.=]')].head(count).tolist()
+
+# Gets a panel of daily closes, one column per ticker, like get_close_data returns
+def make_close_panel(ticker_count, period_code):
+    closes = {ticker: make_bars(ticker, '1d', period_code)['Close'] for ticker in get_symbols(ticker_count)}
+    return pd.DataFrame(closes).dropna()
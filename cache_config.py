@@ -1,9 +1,50 @@
+import os
 from flask import Flask
 from flask_caching import Cache
+from utils.cache_backends import get_cache_size
+from utils.metrics import init_metrics, register_gauge
+from utils.profiler import init_profiler
 
 server = Flask(__name__)
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cache backends selectable through CACHE_BACKEND: 'lru' and 'simple' are per process, 'sqlite' and 'redis' are shared by every worker.
+# 'lru' keeps compact serialized frames under a byte budget, 'simple' holds live objects and evicts by entry count
+cache_backends = {
+    'lru': {
+        'CACHE_TYPE': 'utils.cache_backends.LRUCache',
+        'CACHE_LRU_BYTES': int(os.environ.get('CACHE_LRU_BYTES', 256 * 1024 * 1024))
+    },
+    'simple': {
+        'CACHE_TYPE': 'simple'
+    },
+    'sqlite': {
+        'CACHE_TYPE': 'utils.cache_backends.SQLiteCache',
+        'CACHE_SQLITE_PATH': os.environ.get('CACHE_SQLITE_PATH', os.path.join(BASE_DIR, 'data', 'cache.db'))
+    },
+    'redis': {
+        'CACHE_TYPE': 'utils.cache_backends.redis_cache',
+        'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+        'CACHE_KEY_PREFIX': 'dashboard:'
+    }
+}
+
 cache = Cache(server, config={
-    'CACHE_TYPE': 'simple',
+    **cache_backends[os.environ.get('CACHE_BACKEND', 'lru')],
     'CACHE_DEFAULT_TIMEOUT': 900
-})
\ No newline at end of file
+})
+
+# Callback latency, cache, provider and rate limit metrics, served at /metrics
+init_metrics(server)
+
+# Stack profiles of slow callbacks, only when PROFILER=1
+init_profiler(server)
+
+# Bytes and entries in the cache, read whenever /metrics is scraped
+def get_cache_gauge(position):
+    size = get_cache_size(cache.cache)
+    return [({'backend': os.environ.get('CACHE_BACKEND', 'lru')}, size[position])] if size is not None else []
+
+register_gauge('dashboard_cache_bytes', lambda: get_cache_gauge(0))
+register_gauge('dashboard_cache_entries', lambda: get_cache_gauge(1))
@@ -0,0 +1,10 @@
+from utils.config import ticker_df
+from utils.data import refresh_ticker_metadata
+
+# Fills the ticker metadata store for every symbol in total_tickers.csv, tickers refreshed within the last month are skipped
+def fill_ticker_metadata():
+    symbols = ticker_df['Symbol'].dropna().tolist()
+    return refresh_ticker_metadata(symbols)
+
+if __name__ == '__main__':
+    print(f"Refreshed metadata for {fill_ticker_metadata()} tickers")
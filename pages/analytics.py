@@ -4,7 +4,7 @@ import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from utils import data, tech
+from utils import data, tech, streaming
 from utils.config import ticker_df
 
 dash.register_page(__name__, path='/')  
@@ -61,6 +61,26 @@ def render_page(ticker, period, interval):
     if ticker: 
         return [
             dbc.Row(dcc.Graph(id="vwap-graph", style={"height": "75vh"})),
+            dbc.Row([
+                dbc.Col([
+                    html.Label("Profile Bins"),
+                    dcc.Dropdown([25, 50, 100, 250, 500, 1000],
+                                id='profile-bins-dropdown',
+                                value=50,
+                                multi=False,
+                                clearable=False,
+                                persistence=True,
+                                persistence_type='session',)], width=4),
+                dbc.Col([
+                    html.Label("Bar Volume"),
+                    dcc.Dropdown(['At Close', 'Across High-Low Range'],
+                                id='profile-volume-dropdown',
+                                value='At Close',
+                                multi=False,
+                                clearable=False,
+                                persistence=True,
+                                persistence_type='session',)], width=4),
+            ], className='mb-3'),
             dbc.Row(dcc.Graph(id="volume-profile", style={"height": "75vh"})),
             dbc.Row(dcc.Graph(id="rolling-vol", style={"height": "50vh"})),
             dbc.Row(dcc.Graph(id="rolling-beta", style={"height": "50vh"})),
@@ -68,7 +88,6 @@ def render_page(ticker, period, interval):
 
 @callback(
     Output('vwap-graph', 'figure'),
-    Output('volume-profile', 'figure'),
     Output('rolling-vol', 'figure'),
     Output('rolling-beta', 'figure'),
     Input('ana-ticker-input', 'value'),
@@ -79,14 +98,14 @@ def update_graphs(ticker, period, interval):
     ohlc_df = data.get_ohlc_data(ticker, period, interval)
     if ohlc_df.empty:
         empty_fig = go.Figure()
-        return empty_fig, empty_fig, empty_fig, empty_fig
+        return empty_fig, empty_fig, empty_fig
     
     """
     VWAP Graph
     """
-    # Getting base info
-    vwap_df = tech.get_intraday_vwap(ohlc_df)
-    vwap_df = tech.detect_vwap_events(vwap_df)
+    # Getting base info, bars already analysed come from the indicator cache and otherwise only bars newer than the last
+    # refresh of this ticker and interval are calculated
+    vwap_df = data.get_indicator(streaming.get_streaming_vwap, ticker, interval, ohlc_df)
     snapback_points = vwap_df[vwap_df['VWAP Event'] == True]
 
     vwap_fig = go.Figure()
@@ -172,67 +191,10 @@ def update_graphs(ticker, period, interval):
                 'bgcolor': 'rgba(0,0,0,0.5)'},
     )
 
-    """
-    Volume Profile
-    """
-    profile_df = tech.get_volume_profile(ohlc_df, num_bins=50)
-    profile_info = tech.get_profile_info(profile_df)
-    
-    vol_profile_fig = go.Figure()
-    
-    # Build horizontal bar chart
-    vol_profile_fig.add_trace(go.Bar(
-        y=profile_df['Avg Price'],
-        x=profile_df['Total Volume'],
-        orientation='h',
-        name='Volume',
-        marker={'color': 'darkblue'}
-    ))
-    
-    # Add POC line
-    vol_profile_fig.add_hline(
-        y=profile_info['POC'],
-        line_dash='dash',
-        line_color='red',
-        line_width=2,
-        annotation_text=f"POC: ${profile_info['POC']:.2f}",
-        annotation_position="right"
-    )
-    
-    # Add Value Area
-    vol_profile_fig.add_hrect(
-        y0=profile_info['Value Area Low'],
-        y1=profile_info['Value Area High'],
-        fillcolor='green',
-        opacity=0.2,
-        line_width=0,
-    )
-    
-    # Add high volume nodes as horizontal lines
-    for i in profile_info['High Volume Nodes']:
-        vol_profile_fig.add_hline(
-            y=i,
-            line_dash='dot',
-            line_color='yellow',
-            line_width=1.5,
-            opacity=0.7
-    )
-
-    # Update plot layout
-    vol_profile_fig.update_layout(
-        title=f'{ticker} - Volume Profile',
-        xaxis_title='Total Volume',
-        yaxis_title='Price ($)',
-        paper_bgcolor='rgba(0, 0, 0, 0)',
-        plot_bgcolor='#1e1e1e',
-        font={'color': 'white'},
-        showlegend=False,
-    )
-    
     """
     Rolling volatility
     """    
-    vol_df = tech.get_realized_volatility(ohlc_df, interval)
+    vol_df = data.get_indicator(tech.get_realized_volatility, ohlc_df, interval)
     
     rolling_vol_fig = go.Figure()
     
@@ -263,7 +225,7 @@ def update_graphs(ticker, period, interval):
     """
     # Get S&P 500 benchmark data
     benchmark_df = data.get_ohlc_data('^GSPC', period, interval)
-    rolling_beta_series = tech.get_rolling_beta(ohlc_df, benchmark_df)
+    rolling_beta_series = data.get_indicator(tech.get_rolling_beta, ohlc_df, benchmark_df)
     
     rolling_beta_fig = go.Figure()
     
@@ -299,6 +261,75 @@ def update_graphs(ticker, period, interval):
         showlegend=False
     )
     
-    return data.remove_market_gaps(vwap_fig), data.remove_market_gaps(vol_profile_fig), data.remove_market_gaps(rolling_vol_fig), data.remove_market_gaps(rolling_beta_fig)
+    return data.remove_market_gaps(vwap_fig), data.remove_market_gaps(rolling_vol_fig), data.remove_market_gaps(rolling_beta_fig)
+
+# Volume profile has its own callback so changing the bins or how bar volume is placed doesn't redraw the other graphs
+@callback(
+    Output('volume-profile', 'figure'),
+    Input('ana-ticker-input', 'value'),
+    Input('ana-period-select-dropdown', 'value'),
+    Input('ana-interval-select-dropdown', 'value'),
+    Input('profile-bins-dropdown', 'value'),
+    Input('profile-volume-dropdown', 'value'),
+)
+def update_volume_profile(ticker, period, interval, num_bins, bar_volume):
+    ohlc_df = data.get_ohlc_data(ticker, period, interval)
+    if ohlc_df.empty:
+        return go.Figure()
+
+    profile_df = data.get_indicator(tech.get_volume_profile, ohlc_df, num_bins=num_bins,
+                                    distribute=bar_volume == 'Across High-Low Range')
+    profile_info = data.get_indicator(tech.get_profile_info, profile_df)
+    
+    vol_profile_fig = go.Figure()
+    
+    # Build horizontal bar chart
+    vol_profile_fig.add_trace(go.Bar(
+        y=profile_df['Avg Price'],
+        x=profile_df['Total Volume'],
+        orientation='h',
+        name='Volume',
+        marker={'color': 'darkblue'}
+    ))
+    
+    # Add POC line and Value Area, neither exists when no bar traded any volume
+    if profile_info['POC'] is not None:
+        vol_profile_fig.add_hline(
+            y=profile_info['POC'],
+            line_dash='dash',
+            line_color='red',
+            line_width=2,
+            annotation_text=f"POC: ${profile_info['POC']:.2f}",
+            annotation_position="right"
+        )
+
+        vol_profile_fig.add_hrect(
+            y0=profile_info['Value Area Low'],
+            y1=profile_info['Value Area High'],
+            fillcolor='green',
+            opacity=0.2,
+            line_width=0,
+        )
+    
+    # Add high volume nodes as horizontal lines
+    for i in profile_info['High Volume Nodes']:
+        vol_profile_fig.add_hline(
+            y=i,
+            line_dash='dot',
+            line_color='yellow',
+            line_width=1.5,
+            opacity=0.7
+    )
+
+    # Update plot layout
+    vol_profile_fig.update_layout(
+        title=f'{ticker} - Volume Profile',
+        xaxis_title='Total Volume',
+        yaxis_title='Price ($)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+        plot_bgcolor='#1e1e1e',
+        font={'color': 'white'},
+        showlegend=False,
+    )
 
-    
\ No newline at end of file
+    return data.remove_market_gaps(vol_profile_fig)
@@ -154,6 +154,9 @@ def update_market_graphs(period, interval):
     if period is None or interval is None:
         return [go.Figure()] * 10
 
+    # Batch download every index once so the lookups below are all cache hits
+    data.get_bulk_ohlc_data(list(market_map), period, interval)
+
     smp500_data = data.get_ohlc_data("^GSPC", period, interval)
     nasdaq_data = data.get_ohlc_data("^IXIC", period, interval)
     russell2k_data = data.get_ohlc_data("^RUT", period, interval)
@@ -4,7 +4,7 @@ import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from utils import data
+from utils import data, tech
 from utils.config import ticker_df
 
 dash.register_page(__name__, path='/portfolio')  
@@ -191,6 +191,13 @@ def render_tab_content(active_tab, ticker_lst):
                 dbc.Col(dcc.Graph(id='corr-heatmap', style={'height': '50vh'}), width=6),
 
                 dbc.Col(dcc.Graph(id='sector-graph', style={'height': '50vh'}), width=6)
+            ]),
+
+            # Rolling volatility and beta of every holding
+            dbc.Row([
+                dbc.Col(dcc.Graph(id='portfolio-vol-graph', style={'height': '50vh'}), width=6),
+
+                dbc.Col(dcc.Graph(id='portfolio-beta-graph', style={'height': '50vh'}), width=6)
             ])
         ]
 
@@ -525,3 +532,53 @@ def update_news_cards(ticker_list):
         news_cards.append(card)
     
     return news_cards
+
+# Builds a line per holding from a wide frame, plain traces instead of px.line which gets slow with hundreds of columns
+def build_panel_figure(panel_df, title, yaxis_title):
+    if panel_df.empty:
+        return EMPTY_FIGURE
+
+    fig = go.Figure([go.Scatter(x=panel_df.index, y=panel_df[ticker], mode='lines', name=ticker)
+                     for ticker in panel_df.columns])
+
+    return fig.update_layout(
+        title=title,
+        xaxis_title=None,
+        yaxis_title=yaxis_title,
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+        plot_bgcolor='#1e1e1e',
+        font={'color': 'white'})
+
+@callback(
+    Output('portfolio-vol-graph', 'figure'),
+    Output('portfolio-beta-graph', 'figure'),
+    Input('close-data-storage', 'data'),
+    Input('period-select-dropdown', 'value'),
+    Input('interval-select-dropdown', 'value')
+)
+# Callback that builds the rolling volatility and beta of every holding, each one a single pass over the whole portfolio
+def update_risk_graphs(closes_dict, period, interval):
+    if not closes_dict or not closes_dict.get('data'):
+        return EMPTY_FIGURE, EMPTY_FIGURE
+
+    closes_df = pd.DataFrame(closes_dict['data'], index=closes_dict['index'], columns=closes_dict['columns'])
+    closes_df.index = pd.to_datetime(closes_df.index, utc=True)
+
+    vol_df = tech.get_panel_volatility(closes_df, interval)
+
+    # Benchmark closes are matched to the holdings by timestamp
+    benchmark_df = data.get_ohlc_data('^GSPC', period, interval)
+    if not benchmark_df.empty:
+        benchmark_df = benchmark_df.tz_convert('UTC')
+        beta_df = tech.get_panel_beta(closes_df, benchmark_df)
+    else:
+        beta_df = pd.DataFrame()
+
+    vol_fig = build_panel_figure(vol_df, 'Rolling Realized Volatility', 'Annualized Volatility (%)')
+    beta_fig = build_panel_figure(beta_df, 'Rolling Beta to S&P 500', 'Beta (β)')
+
+    # Add horizontal line at beta = 1
+    if not beta_df.empty:
+        beta_fig.add_hline(y=1.0, line_dash='dash', line_color='white', line_width=1)
+
+    return vol_fig, beta_fig
@@ -157,6 +157,9 @@ def update_index_graphs(period, interval):
     if period is None or interval is None:
         return [go.Figure()] * 12
 
+    # Batch download every sector ETF once so the lookups below are all cache hits
+    data.get_bulk_ohlc_data(list(sector_map), period, interval)
+
     comm_data = data.get_ohlc_data('XLC', period, interval)
     consdisc_data = data.get_ohlc_data('XLY', period, interval)
     consstap_data = data.get_ohlc_data('XLP', period, interval)
@@ -304,7 +307,7 @@ def update_sector_news_cards(period, interval):
             html.A(
                 [
                     dbc.CardImg(src=article['image'],
-                                stlye={'height': '150px',
+                                style={'height': '150px',
                                        'width': '100%'}),
                     dbc.CardBody(html.P(article['title'], 
                                         className="card-text",
@@ -0,0 +1,309 @@
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from flask_caching.backends.base import BaseCache
+
+"""
+Serialization
+"""
+
+# Shrinks one column for storage without changing a single value: whole volumes that fit become uint32, prices become
+# float32 only when every one of them converts back exactly (the data layer rounds base series prices so they do).
+# Anything else is kept as it is
+def compact_values(values):
+    if values.dtype.kind in 'iu':
+        fits = len(values) == 0 or (values.min() >= 0 and values.max() <= np.iinfo(np.uint32).max)
+        return values.astype(np.uint32) if fits and values.dtype.itemsize > 4 else values
+
+    if values.dtype.kind != 'f':
+        return values
+
+    whole = np.isfinite(values).all() and not np.signbit(values).any() and (values == np.round(values)).all()
+    if whole and (values <= np.iinfo(np.uint32).max).all():
+        return values.astype(np.uint32)
+
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+        return narrow
+    return values
+
+# Bar times are whole seconds apart and only move forward, so they are kept as the first time and uint32 second steps.
+# Returns (start, steps), or (None, times) when they don't fit that
+def compact_index(times):
+    if len(times) > 1 and (times % 10**9 == 0).all():
+        steps = np.diff(times) // 10**9
+        if steps.min() >= 0 and steps.max() <= np.iinfo(np.uint32).max:
+            return int(times[0]), steps.astype(np.uint32)
+    return None, times
+
+# Rebuilds the nanosecond times written by compact_index
+def expand_index(start, times):
+    if start is None:
+        return times
+    return start + np.concatenate([[0], np.cumsum(times, dtype=np.int64)]) * 10**9
+
+# Breaks a time-indexed frame of plain numeric columns into raw NumPy buffers, anything else is left for pickle.
+# Columns are stored compactly and come back with their original dtypes, so a cached frame equals the one stored
+def encode_frame(df):
+    if not isinstance(df.index, pd.DatetimeIndex) or not all(dtype.kind in 'biuf' for dtype in df.dtypes):
+        return df
+
+    index = df.index.tz_convert('UTC') if df.index.tz is not None else df.index
+    start, times = compact_index(index.as_unit('ns').asi8)
+    return {'__frame__': 1,
+            'start': start,
+            'index': times,
+            'unit': df.index.unit,
+            'tz': str(df.index.tz) if df.index.tz is not None else None,
+            'name': df.index.name,
+            'columns': list(df.columns),
+            'dtypes': [str(dtype) for dtype in df.dtypes],
+            'values': [compact_values(np.ascontiguousarray(df[col].to_numpy())) for col in df.columns]}
+
+# Rebuilds a frame from the buffers written by encode_frame
+def decode_frame(blob):
+    times = expand_index(blob.get('start'), blob['index'])
+    index = pd.DatetimeIndex(pd.to_datetime(times, utc=blob['tz'] is not None), name=blob['name'])
+    if blob['tz'] is not None:
+        index = index.tz_convert(blob['tz'])
+    if blob.get('unit'):
+        index = index.as_unit(blob['unit'])
+
+    dtypes = blob.get('dtypes', [None] * len(blob['columns']))
+    columns = {col: values.astype(dtype) if dtype is not None else values
+               for col, values, dtype in zip(blob['columns'], blob['values'], dtypes)}
+
+    return pd.DataFrame(columns, index=index, columns=blob['columns'])
+
+# Pickle protocol 5 writes NumPy buffers without per-element overhead, and frames avoid pickling pandas internals
+class FrameSerializer:
+    def dumps(self, value):
+        if isinstance(value, pd.DataFrame):
+            value = encode_frame(value)
+        return pickle.dumps(value, protocol=5)
+
+    def loads(self, data):
+        if data is None:
+            return None
+
+        value = pickle.loads(data)
+        if isinstance(value, dict) and value.get('__frame__') == 1:
+            return decode_frame(value)
+        return value
+
+"""
+In-memory LRU backend
+"""
+
+# Per-process cache holding serialized values under a byte budget, the least recently used entries are evicted first
+class LRUCache(BaseCache):
+    def __init__(self, max_bytes, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.max_bytes = max_bytes
+        self.serializer = FrameSerializer()
+        self._entries = OrderedDict()  # Key to (expires, serialized value), oldest use first
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        return cls(int(config['CACHE_LRU_BYTES']), default_timeout=kwargs.get('default_timeout', 300))
+
+    # Absolute expiry time for a timeout, 0 means the entry never expires
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else None
+
+    # Gets a live entry and marks it as just used, expired entries are dropped on the way. Needs the lock held
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires, data = entry
+        if expires is not None and expires <= time.time():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return data
+
+    def _remove(self, key):
+        expires, data = self._entries.pop(key)
+        self.bytes_used -= len(data)
+
+    # Stores serialized bytes and evicts from the least recently used end until the budget holds. Needs the lock held
+    def _store(self, key, data, timeout):
+        if key in self._entries:
+            self._remove(key)
+
+        # A value bigger than the whole budget would only evict everything else
+        if len(data) > self.max_bytes:
+            return False
+
+        self._entries[key] = (self._expires(timeout), data)
+        self.bytes_used += len(data)
+
+        while self.bytes_used > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        return True
+
+    def get(self, key):
+        with self._lock:
+            data = self._live(key)
+        return self.serializer.loads(data)
+
+    def set(self, key, value, timeout=None):
+        data = self.serializer.dumps(value)
+        with self._lock:
+            return self._store(key, data, timeout)
+
+    # Only writes if the key is missing or expired, atomic within the process so it can double as a lock
+    def add(self, key, value, timeout=None):
+        data = self.serializer.dumps(value)
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            return self._store(key, data, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def has(self, key):
+        with self._lock:
+            return self._live(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+        return True
+
+"""
+SQLite backend
+"""
+
+# Cache shared by every worker process through one SQLite file, needs no external service
+class SQLiteCache(BaseCache):
+    def __init__(self, path, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.path = path
+        self.serializer = FrameSerializer()
+        self._local = threading.local()
+        self._writes = itertools.count(1)  # Shared by every thread, next() on it is atomic
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        return cls(config['CACHE_SQLITE_PATH'], default_timeout=kwargs.get('default_timeout', 300))
+
+    # Each thread keeps its own connection, WAL lets readers and the writer run at the same time
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # Absolute expiry time for a timeout, 0 means the entry never expires
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else None
+
+    # Drops expired rows every so often instead of on every write
+    def _prune(self, conn):
+        if next(self._writes) % 100 == 0:
+            conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return self.serializer.loads(row[0]) if row else None
+
+    def set(self, key, value, timeout=None):
+        data = self.serializer.dumps(value)
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?)', (key, data, self._expires(timeout)))
+            self._prune(conn)
+        return True
+
+    # Only writes if the key is missing or expired, atomic across processes so it can double as a lock
+    def add(self, key, value, timeout=None):
+        data = self.serializer.dumps(value)
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires IS NOT NULL AND expires <= ?', (key, time.time()))
+            cursor = conn.execute('INSERT OR IGNORE INTO cache VALUES (?, ?, ?)', (key, data, self._expires(timeout)))
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    def has(self, key):
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache')
+        return True
+
+"""
+Redis backend
+"""
+
+# Flask-Caching's Redis backend with DataFrame-aware serialization, works against any server speaking the Redis protocol
+def redis_cache(app, config, args, kwargs):
+    from flask_caching.backends.rediscache import RedisCache
+
+    cache = RedisCache.factory(app, config, args, kwargs)
+    cache.serializer = FrameSerializer()
+    return cache
+
+"""
+Cache size
+"""
+
+# Gets the bytes and entries a cache backend holds, or None when the backend can't tell
+def get_cache_size(backend):
+    if isinstance(backend, LRUCache):
+        with backend._lock:
+            return backend.bytes_used, len(backend._entries)
+
+    if isinstance(backend, SQLiteCache):
+        return backend._connection().execute('SELECT COALESCE(SUM(LENGTH(value)), 0), COUNT(*) FROM cache').fetchone()
+
+    # Flask-Caching's simple backend keeps pickled values in a plain dictionary
+    entries = getattr(backend, '_cache', None)
+    if isinstance(entries, dict):
+        values = list(entries.values())
+        return sum(len(value) for expires, value in values if isinstance(value, bytes)), len(values)
+
+    client = getattr(backend, '_write_client', None)
+    if client is not None:
+        return client.info('memory')['used_memory'], client.dbsize()
+
+    return None
@@ -14,6 +14,19 @@ interval_map = {
     '1 Month': '1mo', '3 Months': '3mo'
 }
 
+# Trading sessions: local timezone, weekdays a session opens on (Monday = 0), local opening time and length in hours
+market_sessions = {
+    'US': ('America/New_York', [0, 1, 2, 3, 4], '09:30', 6.5),
+    'CA': ('America/Toronto', [0, 1, 2, 3, 4], '09:30', 6.5),
+    'FUTURES': ('America/New_York', [6, 0, 1, 2, 3], '18:00', 23)
+}
+
+# Intervals downloaded from Yahoo, finest first, every other interval is resampled locally from one of these
+base_intervals = ['5m', '60m', '1d']
+
+# Longest history in days Yahoo serves for each intraday base interval
+intraday_limits = {'5m': 60, '60m': 730}
+
 valid_intervals_map = {
     '1 Year': ['1 Day', '5 Days', '1 Week', '1 Month', '3 Months'],
     'Year To Date': ['1 Day', '5 Days', '1 Week', '1 Month', '3 Months'],
@@ -64,5 +77,36 @@ annualization_factors = {
     '3 Months': np.sqrt(4)                  # 4 quarters/year
 }
 
+# Yahoo request budget shared by every fetcher in a process: tokens refilled per second and the largest burst allowed
+PROVIDER_RATE = float(os.environ.get('PROVIDER_RATE', 0.5))
+PROVIDER_BURST = int(os.environ.get('PROVIDER_BURST', 10))
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Where market data comes from: 'yfinance', 'record' (yfinance, saving every response), 'replay' (saved responses only)
+# or 'synthetic' (generated locally). Offline providers wait PROVIDER_LATENCY seconds on average per call
+DATA_PROVIDER = os.environ.get('DATA_PROVIDER', 'yfinance')
+PROVIDER_RECORD_DIR = os.environ.get('PROVIDER_RECORD_DIR', os.path.join(BASE_DIR, 'data', 'recordings'))
+PROVIDER_LATENCY = float(os.environ.get('PROVIDER_LATENCY', 0))
+PROVIDER_SEED = int(os.environ.get('PROVIDER_SEED', 0))
+
+# Opt-in sampling profiler for Dash callbacks: callbacks slower than PROFILER_THRESHOLD seconds keep their inputs and
+# stack samples taken every PROFILER_INTERVAL seconds, the newest PROFILER_CAPTURES are served under /admin/slow-callbacks
+PROFILER_ENABLED = os.environ.get('PROFILER', '0') == '1'
+PROFILER_THRESHOLD = float(os.environ.get('PROFILER_THRESHOLD', 2.0))
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))
+PROFILER_CAPTURES = int(os.environ.get('PROFILER_CAPTURES', 50))
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+
+# Seconds a cached indicator result is kept, results are keyed by their input bars so this only bounds storage
+INDICATOR_CACHE_TTL = int(os.environ.get('INDICATOR_CACHE_TTL', 3600))
+
+# Most (ticker, interval) streaming VWAP engines kept per process, the least recently viewed is dropped past this
+VWAP_ENGINES = int(os.environ.get('VWAP_ENGINES', 256))
+
+# SQLite file holding the persistent OHLC history, shared by every worker process. Every provider other than live Yahoo
+# keeps its own file, so recorded, replayed or generated bars never mix with the live history
+STORE_PATH = os.environ.get('STORE_PATH', os.path.join(BASE_DIR, 'data', 'market_data.db' if DATA_PROVIDER == 'yfinance'
+                                                       else f'market_data_{DATA_PROVIDER}.db'))
+
 ticker_df = pd.read_csv(os.path.join(BASE_DIR, "total_tickers.csv"))
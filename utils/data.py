@@ -1,32 +1,532 @@
-import yfinance as yf
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from utils.config import period_map, interval_map, valid_intervals_map
+from utils.config import period_map, interval_map, valid_intervals_map, base_intervals, intraday_limits, PROVIDER_RATE, PROVIDER_BURST, INDICATOR_CACHE_TTL
+from utils import store, metrics
+from utils.providers import get_provider
+from utils.resample import can_resample, resample_ohlc
+from utils.market_hours import get_ticker_timezone, get_cache_ttl, MIN_TTL
 from cache_config import cache
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import contextlib
+import functools
+import hashlib
+import threading
 import time
+import uuid
 
 def get_valid_interval(period):
     return valid_intervals_map[period]
 
+"""
+Rate limiting
+"""
+
+# Token bucket shared by every provider call, callers only wait once the burst budget is used up
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+        # Running totals of how often and how long callers were queued
+        self.acquired = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+
+    # Refills for the time elapsed since the last call, the lock must be held
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Takes tokens from the bucket, sleeping until they are available, and returns the time spent queued
+    def acquire(self, tokens=1):
+        with self.lock:
+            self.refill()
+
+            # Reserve the tokens now, going negative means later callers queue behind this one
+            self.tokens -= tokens
+            wait = max(0.0, -self.tokens / self.rate)
+
+            self.acquired += 1
+            if wait > 0:
+                self.queued += 1
+                self.wait_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    # Takes tokens only when they are in the bucket right now with reserve left over for other callers, never queues.
+    # Returns whether the tokens were taken
+    def try_acquire(self, tokens=1, reserve=0):
+        with self.lock:
+            self.refill()
+            if self.tokens - tokens < reserve:
+                return False
+
+            self.tokens -= tokens
+            self.acquired += 1
+            return True
+
+    # Summary of the time callers have spent queued
+    def stats(self):
+        with self.lock:
+            return {'acquired': self.acquired,
+                    'queued': self.queued,
+                    'wait_seconds': self.wait_seconds,
+                    'tokens': self.tokens}
+
+provider_limiter = TokenBucket(PROVIDER_RATE, PROVIDER_BURST)
+
+# Tokens background refreshes always leave in the bucket, so users never queue behind them
+BACKGROUND_RESERVE = PROVIDER_BURST // 2
+
+# Raised by a background provider call when the rate limit budget can't spare its tokens right now
+class RateLimited(Exception):
+    pass
+
+# Waits for Yahoo request tokens before a provider call, offline providers never reach Yahoo and skip the wait.
+# Background calls don't wait: they only take tokens already spare and raise RateLimited otherwise
+def throttle(tokens=1, background=False):
+    if not get_provider().rate_limited:
+        return
+
+    if background:
+        if not provider_limiter.try_acquire(tokens, reserve=BACKGROUND_RESERVE):
+            raise RateLimited(f"No spare provider tokens for {tokens} requests")
+        return
+
+    metrics.observe('dashboard_rate_limit_wait_seconds', provider_limiter.acquire(tokens))
+
+# Calls a provider method, timing it by method and outcome
+def call_provider(method, *args):
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        result = getattr(get_provider(), method)(*args)
+        status = 'ok'
+        return result
+    finally:
+        metrics.observe('dashboard_provider_duration_seconds', time.perf_counter() - start,
+                        {'method': method, 'status': status})
+
+# Reads a cache entry, counting the hit or miss against the function asking
+def cache_lookup(key, function):
+    value = cache.get(key)
+    metrics.inc('dashboard_cache_requests_total', {'function': function, 'result': 'miss' if value is None else 'hit'})
+    return value
+
+# Counts lookups served from the local store as hits, and the ones that had to go to the provider as misses
+def count_store_lookups(function, ticker_list, stale):
+    fresh = len(dict.fromkeys(ticker_list)) - len(stale)
+    metrics.inc('dashboard_cache_requests_total', {'function': function, 'result': 'hit'}, fresh)
+    metrics.inc('dashboard_cache_requests_total', {'function': function, 'result': 'miss'}, len(stale))
+
+"""
+Indicator cache
+"""
+
+# Feeds a value into a fingerprint: frames and series by their index, column names and raw value bytes, anything else
+# by its repr. Columns that aren't plain numbers or times are hashed row by row with pandas' own stable hash
+def update_fingerprint(hasher, value):
+    if not isinstance(value, (pd.DataFrame, pd.Series)):
+        hasher.update(repr(value).encode())
+        return
+
+    df = value.to_frame() if isinstance(value, pd.Series) else value
+    hasher.update(repr((type(value).__name__, str(df.index.dtype), list(df.columns), [str(dtype) for dtype in df.dtypes],
+                        len(df))).encode())
+
+    for values in [df.index] + [df[col] for col in df.columns]:
+        if values.dtype.kind in 'mM':
+            hasher.update(pd.Index(values).asi8.tobytes())
+        elif values.dtype.kind in 'biufc':
+            hasher.update(np.ascontiguousarray(values.to_numpy()).tobytes())
+        else:
+            hasher.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+
+# Gets a technical indicator through the cache, keyed by the indicator and a fingerprint of its bars and parameters, so
+# bars that were already analysed, by another user or an earlier render, skip straight to building figures. Indicators
+# only depend on their inputs, so new bars mean a new key rather than a stale entry
+def get_indicator(func, *args, **kwargs):
+    hasher = hashlib.blake2b(f'{func.__module__}.{func.__qualname__}'.encode(), digest_size=16)
+    for value in args:
+        update_fingerprint(hasher, value)
+    for name, value in sorted(kwargs.items()):
+        hasher.update(name.encode())
+        update_fingerprint(hasher, value)
+
+    key = f'indicator:{func.__name__}:{hasher.hexdigest()}'
+    cached = cache_lookup(key, func.__name__)
+    if cached is not None:
+        return cached[0]
+
+    # Wrapped so the serializer stores the result as is rather than as a bar frame
+    result = func(*args, **kwargs)
+    cache.set(key, (result,), timeout=INDICATOR_CACHE_TTL)
+    return result
+
+"""
+Concurrent fetching
+"""
+
+# Most per-ticker provider calls in flight at once from one process, and how long a single ticker may run
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 10
+
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='provider-fetch')
+
+# Runs a per-ticker fetch over a list of tickers on the shared pool and yields (ticker, result) pairs as they complete.
+# Each ticker first waits for its provider token, so func must not throttle again, then gets its own timeout counted
+# from when it starts running. Tickers that fail or time out are left out
+def fetch_concurrently(func, ticker_list, *args, timeout=FETCH_TIMEOUT):
+    started = {}  # When each ticker's call began running, after its time queued for a token
+
+    def run(ticker):
+        throttle()
+        started[ticker] = time.monotonic()
+        return func(ticker, *args)
+
+    pending = {fetch_pool.submit(run, ticker): ticker for ticker in dict.fromkeys(ticker_list)}
+
+    while pending:
+        done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            ticker = pending.pop(future)
+            if future.exception() is None:
+                yield ticker, future.result()
+
+        # Give up on calls that have been running too long, they finish in the background and are ignored
+        now = time.monotonic()
+        for future, ticker in list(pending.items()):
+            if ticker in started and now - started[ticker] > timeout:
+                del pending[future]
+
+"""
+Request coalescing
+"""
+
+# Concurrent calls in this process with the same arguments share one execution, the first caller runs it and the rest
+# wait for its result. Other worker processes are kept off the same fetch by shared_lock, taken after a cache miss
+def single_flight(func):
+    in_flight = {}  # Futures of the calls currently running in this process
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = repr((args, sorted(kwargs.items())))
+
+        with lock:
+            call = in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = in_flight[key] = Future()
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = func(*args, **kwargs)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with lock:
+                in_flight.pop(key, None)
+
+    return wrapper
+
+# Holds a short lived lock entry in the shared cache so worker processes missing the same data fetch it once: the
+# holder fetches, the rest wait and should check the cache or store again before fetching themselves. Waiting gives
+# up after timeout and goes ahead unlocked. Yields whether the lock was acquired, only an acquired lock is released
+@contextlib.contextmanager
+def shared_lock(name, timeout=60):
+    lock_key = f'lock:{name}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+
+    acquired = cache.add(lock_key, token, timeout=timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.1)
+        acquired = cache.add(lock_key, token, timeout=timeout)
+
+    try:
+        yield acquired
+    finally:
+        # A lock held past its timeout may have expired and been taken by another process, that one is left alone
+        if acquired and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
 """
 Data fetching functions
 """
 
+# Gets the earliest timestamp a Yahoo period reaches back to, the trading day periods leave room for weekends and holidays
+def get_period_start(period_code, tz):
+    today = pd.Timestamp.now(tz=tz).normalize()
+
+    if period_code == 'ytd':
+        return today.replace(month=1, day=1)
+    if period_code.endswith('d'):
+        return today - pd.offsets.BDay(int(period_code[:-1]))
+    if period_code.endswith('mo'):
+        return today - pd.DateOffset(months=int(period_code[:-2]))
+    return today - pd.DateOffset(years=int(period_code[:-1]))
+
+# Keeps only the bars inside a Yahoo period, the trading day periods keep the last N sessions
+def slice_period(df, period_code):
+    if df.empty:
+        return df
+
+    if period_code.endswith('d') and period_code != 'ytd':
+        sessions = df.index.normalize().unique()
+        start = sessions[max(0, len(sessions) - int(period_code[:-1]))]
+    else:
+        start = get_period_start(period_code, df.index.tz)
+
+    # Slicing by position keeps the result a view of the longer series instead of a copy
+    return df.iloc[df.index.searchsorted(start):]
+
+# Downloads OHLC bars for a list of tickers in one batched Yahoo call and splits the result into per-ticker frames
+def download_ohlc_data(ticker_list, interval_code, period_code=None, start=None, background=False):
+    # One token per ticker, yfinance still requests each symbol separately behind the batch
+    throttle(len(ticker_list), background)
+    raw = call_provider('download', ticker_list, interval_code, period_code, start)
+
+    # Older yfinance versions return flat columns when only one ticker is downloaded
+    if not isinstance(raw.columns, pd.MultiIndex):
+        raw = pd.concat({ticker_list[0]: raw}, axis=1)
+
+    frames = {}
+    for ticker in ticker_list:
+        if raw.empty or ticker not in raw.columns.get_level_values(0):
+            frames[ticker] = pd.DataFrame()
+            continue
+
+        df = raw[ticker].dropna(how='all', subset=['Open', 'High', 'Low', 'Close'])
+        df.columns.name = None
+        if df.index.tz is None:
+            df.index = df.index.tz_localize('UTC')
+        df.index = df.index.tz_convert(get_ticker_timezone(ticker))
+        frames[ticker] = df
+
+    return frames
+
+# Gets the Yahoo interval code for a dropdown label, custom codes such as '2h' or '10m' pass straight through
+def get_interval_code(interval):
+    return interval_map.get(interval, interval)
+
+# Picks the interval actually downloaded for a request: the finest base interval Yahoo serves for the whole period that resamples into the requested one
+def get_base_interval(period_code, interval_code):
+    days = (pd.Timestamp.now() - get_period_start(period_code, None)).days
+
+    for base in base_intervals:
+        if can_resample(base, interval_code) and days <= intraday_limits.get(base, days):
+            return base
+
+    # Nothing finer fits, so download the interval itself
+    return interval_code
+
+# Days short of Yahoo's intraday window an incremental download may start, the window is counted loosely at its edge
+INTRADAY_MARGIN_DAYS = 2
+
+# Brings the on-disk OHLC store up to date for a list of tickers, only requesting bars newer than the ones already stored.
+# Stored bars count as fresh for the market hours TTL from when they were last checked, less an optional lead time.
+# Background updates raise RateLimited rather than queue for provider tokens
+def update_ohlc_store(ticker_list, period_code, interval_code, lead=0, background=False):
+    full = []  # Tickers whose stored history doesn't reach back far enough
+    incremental = {}  # Tickers that only need bars from their last stored timestamp onward
+    now = pd.Timestamp.now(tz='UTC')
+
+    # Yahoo refuses intraday requests starting further back than its window, so series last stored before it (less a
+    # margin) are downloaded in full instead
+    window = intraday_limits.get(interval_code)
+    oldest_start = now - pd.Timedelta(days=window - INTRADAY_MARGIN_DAYS) if window is not None else None
+
+    for ticker in ticker_list:
+        info = store.get_store_info(ticker, interval_code)
+        if info is None or info['last_ts'] is None or info['covered_from'] > get_period_start(period_code, info['tz']):
+            full.append(ticker)
+            continue
+
+        if oldest_start is not None and info['last_ts'] < oldest_start:
+            full.append(ticker)
+            continue
+
+        updated = pd.Timestamp(info['updated'], unit='s', tz='UTC')
+        if now >= updated + pd.Timedelta(seconds=get_cache_ttl(ticker, interval_code, updated) - lead):
+            incremental[ticker] = info['last_ts']
+
+    # Re-request from the last stored bar so a bar that was still forming gets overwritten with its final values
+    if incremental:
+        new_frames = download_ohlc_data(list(incremental), interval_code, start=min(incremental.values()),
+                                        background=background)
+
+        for ticker, df in new_frames.items():
+            # A successful answer always re-sends the last stored bar, so nothing back means the call failed or was
+            # throttled for this ticker. Its stored bars keep their update time and the next request tries again
+            if df.empty:
+                continue
+
+            # Dividends and splits re-adjust the whole history, so those tickers get a full download instead
+            new_bars = df[df.index > incremental[ticker]]
+            actions = new_bars.reindex(columns=['Dividends', 'Stock Splits']).fillna(0)
+            if actions.ne(0).any().any():
+                full.append(ticker)
+            else:
+                # Saving marks the ticker as checked even when the last stored bar is all that came back
+                store.save_bars(ticker, interval_code, df[df.index >= incremental[ticker]])
+
+    if full:
+        for ticker, df in download_ohlc_data(full, interval_code, period_code=period_code, background=background).items():
+            covered_from = get_period_start(period_code, get_ticker_timezone(ticker))
+            store.save_bars(ticker, interval_code, df, covered_from=covered_from, replace=True)
+
+# Gets the longest dropdown period served from each base interval, every shorter period is a slice of it
+def get_superset_periods():
+    supersets = {}
+    for period, intervals in valid_intervals_map.items():
+        period_code = period_map[period]
+        length = pd.Timestamp.now() - get_period_start(period_code, None)
+
+        for interval in intervals:
+            base_code = get_base_interval(period_code, interval_map[interval])
+            if base_code not in supersets or length > supersets[base_code][1]:
+                supersets[base_code] = (period_code, length)
+
+    return {base_code: period_code for base_code, (period_code, length) in supersets.items()}
+
+superset_periods = get_superset_periods()
+
+# Picks the period downloaded for a request, the superset for its base interval unless the request reaches further back
+def get_fetch_period(period_code, base_code):
+    superset = superset_periods.get(base_code)
+    if superset is None or get_period_start(period_code, None) < get_period_start(superset, None):
+        return period_code
+    return superset
+
+# Cache key of a ticker's base series
+def get_base_cache_key(ticker, fetch_period, base_code):
+    return f'ohlc:{ticker}:{fetch_period}:{base_code}'
+
+# Gets a ticker's bars at a base interval over a whole fetch period, shared by every shorter period and coarser interval
+@single_flight
+def get_base_ohlc_data(ticker, fetch_period, base_code):
+    key = get_base_cache_key(ticker, fetch_period, base_code)
+    df = cache_lookup(key, 'get_base_ohlc_data')
+    if df is None:
+        # Another worker may be downloading the same series, once it finishes the cache already has it
+        with shared_lock(key):
+            df = cache.get(key)
+            if df is None:
+                df = refresh_base_ohlc_data([ticker], fetch_period, base_code)[ticker]
+    return df
+
+# Cuts a request out of a base series: slices the period, then resamples when the base is finer than the interval asked for
+def build_ohlc_data(base_df, period_code, interval_code, base_code):
+    df = slice_period(base_df, period_code)
+
+    if base_code != interval_code:
+        df = resample_ohlc(df, interval_code)
+
+    return df
+
 # Gets Open, High, Low, Close and Volume data for a single ticker
-@cache.memoize(timeout=900)
 def get_ohlc_data(ticker, period, interval):
-    time.sleep(2.0)
-    
     if ticker is None or period is None or interval is None:
         return pd.DataFrame()
-    
-    df = yf.Ticker(ticker).history(
-        period=period_map[period],
-        interval=interval_map[interval]
-    )
 
+    period_code = period_map[period]
+    interval_code = get_interval_code(interval)
+    base_code = get_base_interval(period_code, interval_code)
+
+    base_df = get_base_ohlc_data(ticker, get_fetch_period(period_code, base_code), base_code)
+
+    return build_ohlc_data(base_df, period_code, interval_code, base_code)
+
+# Columns the pages read from a base series, dividends and splits only matter while the store is being updated
+base_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Trims a base series to the columns the pages read and rounds its prices to float32 precision, a relative error under
+# 6e-8 (far less than a cent), so the cache holds them in half the space. Callers get this same frame on a miss as
+# the cache hands back on a hit
+def compact_base_frame(df):
+    if df.empty:
+        return df
+
+    df = df[base_columns].copy()
+    prices = ['Open', 'High', 'Low', 'Close']
+    df[prices] = df[prices].astype(np.float32).astype(np.float64)
     return df
 
+# Refreshes the base series of a list of tickers with one batched download and caches each one until its stored bars
+# are due a refresh, a stale grace keeps the entry servable for a while after that
+def refresh_base_ohlc_data(ticker_list, fetch_period, base_code, lead=0, stale_grace=0, background=False):
+    update_ohlc_store(ticker_list, fetch_period, base_code, lead=lead, background=background)
+
+    base_frames = {}
+    for ticker in ticker_list:
+        df = compact_base_frame(slice_period(store.load_bars(ticker, base_code), fetch_period))
+
+        # The stored bars may have been downloaded a while ago, their TTL runs from then rather than from now. Bars
+        # already past it (the provider failed) are retried after MIN_TTL, a timeout of 0 would never expire. Nothing
+        # stored means the download failed or came back empty, which is only held for MIN_TTL before trying again
+        info = store.get_store_info(ticker, base_code)
+        if info is None or df.empty:
+            timeout = MIN_TTL
+        else:
+            updated = pd.Timestamp(info['updated'], unit='s', tz='UTC')
+            ttl = get_cache_ttl(ticker, base_code, updated) - (time.time() - info['updated'])
+            timeout = max(int(ttl), MIN_TTL) + stale_grace
+        cache.set(get_base_cache_key(ticker, fetch_period, base_code), df, timeout=timeout)
+        base_frames[ticker] = df
+
+    return base_frames
+
+# Gets OHLC data for a list of tickers with one batched download, and fills the get_base_ohlc_data cache with each ticker's series
+@single_flight
+def get_bulk_ohlc_data(ticker_list, period, interval):
+    if not ticker_list or period is None or interval is None:
+        return {}
+
+    period_code = period_map[period]
+    interval_code = get_interval_code(interval)
+    base_code = get_base_interval(period_code, interval_code)
+    fetch_period = get_fetch_period(period_code, base_code)
+
+    base_frames = {}  # Dictionary holding each ticker's base series
+    missing = []  # Tickers not already in the cache
+
+    # Serve whatever is already cached, and only update the rest
+    for ticker in dict.fromkeys(ticker_list):
+        df = cache_lookup(get_base_cache_key(ticker, fetch_period, base_code), 'get_bulk_ohlc_data')
+        if df is None:
+            missing.append(ticker)
+        else:
+            base_frames[ticker] = df
+
+    if missing:
+        # Another worker may be downloading the same tickers, whatever it cached in the meantime isn't fetched again
+        with shared_lock('bulk:' + hashlib.md5(repr((missing, fetch_period, base_code)).encode()).hexdigest()):
+            for ticker in list(missing):
+                df = cache.get(get_base_cache_key(ticker, fetch_period, base_code))
+                if df is not None:
+                    base_frames[ticker] = df
+                    missing.remove(ticker)
+
+            if missing:
+                base_frames.update(refresh_base_ohlc_data(missing, fetch_period, base_code))
+
+    return {ticker: build_ohlc_data(df, period_code, interval_code, base_code) for ticker, df in base_frames.items()}
+
 # Gets close data for a list of tickers 
 def get_close_data(ticker_list, period, interval):
     if not ticker_list:
@@ -34,9 +534,10 @@ def get_close_data(ticker_list, period, interval):
 
     closes = {} # Dictionary holding close prices
 
-    # Loops through list and adds close prices
+    # Loops through the batched download and adds close prices
+    ohlc_frames = get_bulk_ohlc_data(ticker_list, period, interval)
     for t in ticker_list:
-        df = get_ohlc_data(t, period, interval)
+        df = ohlc_frames.get(t, pd.DataFrame())
         if not df.empty:
             closes[t] = df['Close']
 
@@ -47,12 +548,61 @@ def get_close_data(ticker_list, period, interval):
 
     return df
 
-# Gets ticker info
-@cache.memoize(timeout=3600)
+# Gets the full info dictionary of a ticker straight from Yahoo, hundreds of fields so it is never cached as is
 def get_ticker_info(ticker):
     if not ticker:
         return {}
-    return yf.Ticker(ticker).info
+    throttle()
+    return call_provider('info', ticker)
+
+"""
+Ticker metadata
+"""
+
+# Seconds before stored ticker metadata is looked up again, sectors and exchanges rarely change
+METADATA_MAX_AGE = 30 * 24 * 3600
+
+# Checks whether a ticker's metadata was stored within max_age
+def is_metadata_fresh(ticker, max_age):
+    stored = store.load_ticker_metadata([ticker]).get(ticker)
+    return stored is not None and time.time() - stored['updated'] <= max_age
+
+# Fetches a ticker's info from Yahoo and stores only the compact metadata fields, unless they were stored within max_age
+# (by another worker the call waited on, for one). Returns whether the ticker was fetched. Runs under
+# fetch_concurrently, which takes the provider token
+@single_flight
+def fetch_ticker_metadata(ticker, max_age=METADATA_MAX_AGE):
+    if is_metadata_fresh(ticker, max_age):
+        return False
+
+    with shared_lock(f'metadata:{ticker}'):
+        if is_metadata_fresh(ticker, max_age):
+            return False
+
+        info = call_provider('info', ticker)
+
+        # Saved as each result comes in so a long universe refresh can be stopped and resumed
+        store.save_ticker_metadata({ticker: {'sector': info.get('sector'),
+                                             'industry': info.get('industry'),
+                                             'currency': info.get('currency'),
+                                             'exchange': info.get('exchange'),
+                                             'market_cap': info.get('marketCap')}})
+        return True
+
+# Looks up tickers missing from the metadata store, or stored longer ago than max_age, and saves what comes back.
+# Returns how many tickers were refreshed
+def refresh_ticker_metadata(ticker_list, max_age=METADATA_MAX_AGE):
+    stored = store.load_ticker_metadata(ticker_list)
+    now = time.time()
+    stale = [t for t in dict.fromkeys(ticker_list) if t not in stored or now - stored[t]['updated'] > max_age]
+    count_store_lookups('get_ticker_metadata', ticker_list, stale)
+
+    return sum(fetched for ticker, fetched in fetch_concurrently(fetch_ticker_metadata, stale, max_age))
+
+# Gets the metadata of a list of tickers as a dictionary keyed by ticker, read locally and only fetched for tickers not stored yet
+def get_ticker_metadata(ticker_list):
+    refresh_ticker_metadata(ticker_list)
+    return store.load_ticker_metadata(ticker_list)
 
 # Used for std, cor, etc, gets weekly close prices 
 def get_weekly_close(close_df):
@@ -93,17 +643,17 @@ def get_volume_data(ticker, period, interval):
     
     return volume.dropna()
 
-# Gets the sectors of a list of tickers
-@cache.memoize(timeout=900)
+# Gets the sectors of a list of tickers, read per ticker from the metadata store so the order and mix of tickers don't matter
 def get_sector_info(ticker_list):
     if not ticker_list:
         return pd.DataFrame()
 
+    # Sectors come from the local metadata store
+    metadata = get_ticker_metadata(ticker_list)
+
     sector_data = []    
-    for ticker in ticker_list:
-        time.sleep(2.0)
-        info = get_ticker_info(ticker)
-        sector = info.get('sector')
+    for ticker in dict.fromkeys(ticker_list):
+        sector = metadata.get(ticker, {}).get('sector')
         
         # Only add if sector exists
         if sector is not None:
@@ -115,33 +665,71 @@ def get_sector_info(ticker_list):
     
     return df
 
-# Access a certain amount of recent news related to a list of tickers
-@cache.memoize(timeout=900)
-def get_news(ticker_list, article_amnt):
-    if not ticker_list:
-        return pd.DataFrame()
-    
-    news_list = []
+# Seconds before a ticker's news is checked against the provider again
+NEWS_MAX_AGE = 900
 
-    # Go through each ticker in a list and find news for each ticker
-    for ticker in ticker_list:
-        try:
-            time.sleep(2.0)
-            stock = yf.Ticker(ticker)
-            news = stock.news[:article_amnt]
+# Checks whether a ticker's news was checked against the provider within max_age
+def is_news_fresh(ticker, max_age):
+    checked = store.get_news_marks([ticker]).get(ticker, (None, None))[1]
+    return checked is not None and time.time() - checked <= max_age
+
+# Fetches a ticker's news from Yahoo and stores the articles newer than its high-water mark, returns how many were new.
+# News checked within max_age (by another worker the call waited on, for one) isn't fetched again. Runs under
+# fetch_concurrently, which takes the provider token
+@single_flight
+def fetch_ticker_news(ticker, max_age=NEWS_MAX_AGE):
+    if is_news_fresh(ticker, max_age):
+        return 0
+
+    with shared_lock(f'news:{ticker}'):
+        if is_news_fresh(ticker, max_age):
+            return 0
 
-            for article in news:
+        last_published = store.get_news_marks([ticker]).get(ticker, (None, None))[0]
+
+        news = call_provider('news', ticker)
+
+        articles = []
+        for article in news:
+            try:
                 content = article['content']
-                
-                news_list.append({
+                published = pd.Timestamp(content['pubDate']).value
+
+                # Anything older than the newest stored article has already been seen
+                if last_published is not None and published < last_published:
+                    continue
+
+                articles.append({
+                    'id': content.get('id') or article['id'],
+                    'published': published,
                     'title': content['title'],
                     'link': content['canonicalUrl']['url'],
                     'image': content['thumbnail']['originalUrl']
                 })
-        except:
-            continue
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        return store.save_news(ticker, articles)
 
-    news_df = pd.DataFrame(news_list)
+# Checks the provider for tickers whose news hasn't been checked within max_age, returns how many new articles were stored
+def refresh_news(ticker_list, max_age=NEWS_MAX_AGE):
+    marks = store.get_news_marks(ticker_list)
+    now = time.time()
+
+    stale = [t for t in dict.fromkeys(ticker_list) if t not in marks or now - marks[t][1] > max_age]
+    count_store_lookups('get_news', ticker_list, stale)
+
+    return sum(count for ticker, count in fetch_concurrently(fetch_ticker_news, stale, max_age))
+
+# Access a certain amount of recent news related to a list of tickers, served from the local news store
+def get_news(ticker_list, article_amnt):
+    if not ticker_list:
+        return pd.DataFrame()
+
+    refresh_news(ticker_list)
+
+    rows = store.load_news(ticker_list, article_amnt)
+    news_df = pd.DataFrame([row[1:4] for row in rows], columns=store.news_columns)
     news_df = news_df.drop_duplicates(subset=['title'], keep='first')
     
     return news_df
@@ -186,13 +774,21 @@ def create_candlestick_graph(ohlc_df, title):
 def get_summary_table(ticker_list, shares_dict, period, interval, port_page):
     if (not ticker_list or not shares_dict) and port_page:
         return pd.DataFrame()
-    
+
+    # Download every ticker at once rather than one request per ticker
+    ohlc_frames = get_bulk_ohlc_data(ticker_list, period, interval)
+    metadata = get_ticker_metadata(ticker_list) if port_page else {}
+
+    return build_summary_table(ticker_list, shares_dict, ohlc_frames, metadata, port_page)
+
+# Calculates the summary table from each ticker's bars, and for the portfolio page its metadata
+def build_summary_table(ticker_list, shares_dict, ohlc_frames, metadata, port_page):
     summary_table = []
     total_value = 0
 
     for ticker in ticker_list:
         # Get OHLC data for each ticker
-        ohlc_data = get_ohlc_data(ticker, period, interval)
+        ohlc_data = ohlc_frames[ticker]
         
         # Calculate metrics
         volume = ohlc_data['Volume'].iloc[-1]
@@ -216,8 +812,7 @@ def get_summary_table(ticker_list, shares_dict, period, interval, port_page):
             value = current_price * num_shares
             total_value += value
 
-            info = get_ticker_info(ticker)
-            sector = info.get('sector')
+            sector = metadata.get(ticker, {}).get('sector')
             sector = "N/A" if sector is None else sector
 
             summary_table.append({
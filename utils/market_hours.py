@@ -0,0 +1,79 @@
+import pandas as pd
+from utils.config import market_sessions, ticker_df
+from utils.resample import parse_interval
+
+# Country of every listed symbol, Canadian listings trade on the TSX/TSXV session
+ticker_country = dict(zip(ticker_df['Symbol'], ticker_df['Country']))
+
+# Futures and currencies that trade nearly around the clock
+around_the_clock = ('=F', '=X', 'DX-Y.NYB')
+
+# Seconds data is cached while a session is open, and right after the close while Yahoo settles the final bars
+MAX_OPEN_TTL = 900
+SETTLE_TTL = 300
+SETTLE_WINDOW = pd.Timedelta(minutes=30)
+MIN_TTL = 60
+
+"""
+Market sessions
+"""
+
+# Gets the market whose session a ticker follows
+def get_ticker_market(ticker):
+    if ticker.endswith(around_the_clock):
+        return 'FUTURES'
+    if ticker_country.get(ticker) == 'CA' or ticker.endswith(('.TO', '.V')) or ticker == '^GSPTSE':
+        return 'CA'
+    return 'US'
+
+# Gets the exchange timezone of a ticker
+def get_ticker_timezone(ticker):
+    return market_sessions[get_ticker_market(ticker)][0]
+
+# Gets the (open, close) of every session starting within a few days either side of a time, oldest first
+def get_sessions(market, now):
+    tz, weekdays, open_time, hours = market_sessions[market]
+    today = now.tz_convert(tz).normalize()
+
+    sessions = []
+    for offset in range(-3, 8):
+        day = today + pd.Timedelta(days=offset)
+        if day.weekday() in weekdays:
+            # Localize the wall clock time so sessions keep their local hours across daylight saving changes
+            session_open = pd.Timestamp(f'{day.date()} {open_time}').tz_localize(tz)
+            sessions.append((session_open, session_open + pd.Timedelta(hours=hours)))
+
+    return sessions
+
+# Whether a market is in its regular session, exchange holidays are not tracked and count as open
+def is_market_open(market, now):
+    return any(session_open <= now < session_close for session_open, session_close in get_sessions(market, now))
+
+# Gets when a market next opens
+def get_next_open(market, now):
+    return next(session_open for session_open, session_close in get_sessions(market, now) if session_open > now)
+
+# Gets when a market last closed
+def get_last_close(market, now):
+    return max(session_close for session_open, session_close in get_sessions(market, now) if session_close <= now)
+
+"""
+Cache lifetime
+"""
+
+# Seconds a ticker's bars stay fresh: about one bar while the market is open, and until the next open once it has closed
+def get_cache_ttl(ticker, interval_code, now=None):
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    market = get_ticker_market(ticker)
+
+    if is_market_open(market, now):
+        # Intraday bars go stale once per bar, daily and longer bars only move with the last price
+        count, unit = parse_interval(interval_code)
+        ttl = count * 60 if unit == 'm' else MAX_OPEN_TTL
+        return max(MIN_TTL, min(ttl, MAX_OPEN_TTL))
+
+    # The final bars of a session can still change for a little while after the close
+    if now - get_last_close(market, now) < SETTLE_WINDOW:
+        return SETTLE_TTL
+
+    return max(MIN_TTL, int((get_next_open(market, now) - now).total_seconds()))
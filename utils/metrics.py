@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import defaultdict
+from flask import g, request, Response
+
+# Upper bounds in seconds of the latency histogram buckets
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Type and help text of every metric, written above its samples
+metric_info = {
+    'dashboard_callback_duration_seconds': ('histogram', 'Time spent answering a Dash callback request'),
+    'dashboard_cache_requests_total': ('counter', 'Cache lookups by the function asking and whether they hit'),
+    'dashboard_provider_duration_seconds': ('histogram', 'Time spent in data provider calls'),
+    'dashboard_rate_limit_wait_seconds': ('histogram', 'Time provider calls spent queued for Yahoo request tokens'),
+    'dashboard_cache_bytes': ('gauge', 'Bytes held by the cache backend'),
+    'dashboard_cache_entries': ('gauge', 'Entries held by the cache backend')
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)  # (name, labels) to value
+_histograms = {}  # (name, labels) to [bucket counts, sum, count]
+_gauges = {}  # Name to a function returning a list of (labels, value)
+
+"""
+Recording
+"""
+
+# Turns a label dictionary into a hashable, consistently ordered key
+def get_label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+# Adds to a counter
+def inc(name, labels=None, amount=1):
+    with _lock:
+        _counters[(name, get_label_key(labels))] += amount
+
+# Records one observation in a histogram
+def observe(name, value, labels=None):
+    key = (name, get_label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(latency_buckets), 0.0, 0]
+
+        for i, bound in enumerate(latency_buckets):
+            if value <= bound:
+                histogram[0][i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+# Registers a gauge read when metrics are scraped, func returns a list of (labels, value)
+def register_gauge(name, func):
+    _gauges[name] = func
+
+"""
+Prometheus text format
+"""
+
+# Writes a label set as {a="1",b="2"}, escaping the characters the format reserves
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+# Renders every metric in the Prometheus text exposition format
+def render_metrics():
+    samples = defaultdict(list)  # Name to its sample lines
+
+    with _lock:
+        for (name, labels), value in _counters.items():
+            samples[name].append(f'{name}{format_labels(labels)} {value}')
+
+        for (name, labels), (buckets, total, count) in _histograms.items():
+            for bound, bucket_count in zip(latency_buckets, buckets):
+                samples[name].append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {bucket_count}')
+            samples[name].append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            samples[name].append(f'{name}_sum{format_labels(labels)} {total}')
+            samples[name].append(f'{name}_count{format_labels(labels)} {count}')
+
+    for name, func in list(_gauges.items()):
+        try:
+            for labels, value in func():
+                samples[name].append(f'{name}{format_labels(get_label_key(labels))} {value}')
+        except Exception:
+            continue
+
+    lines = []
+    for name in sorted(samples):
+        metric_type, help_text = metric_info.get(name, ('untyped', name))
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}'] + samples[name]
+
+    return '\n'.join(lines) + '\n'
+
+"""
+Flask instrumentation
+"""
+
+# Short name of a callback from its output string: the first output and how many more it has
+def get_callback_name(output):
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    return f'{parts[0]} (+{len(parts) - 1})' if len(parts) > 1 else parts[0]
+
+# Times every Dash callback request on a Flask server and serves everything recorded at /metrics
+def init_metrics(server):
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        if request.path.endswith('/_dash-update-component') and 'metrics_start' in g:
+            body = request.get_json(silent=True) or {}
+            observe('dashboard_callback_duration_seconds', time.perf_counter() - g.metrics_start,
+                    {'callback': get_callback_name(body.get('output', 'unknown')), 'status': response.status_code})
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
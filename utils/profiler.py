@@ -0,0 +1,154 @@
+import hmac
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from flask import abort, g, jsonify, request, Response
+from utils.config import PROFILER_ENABLED, PROFILER_THRESHOLD, PROFILER_INTERVAL, PROFILER_CAPTURES, PROFILER_TOKEN
+from utils.metrics import get_callback_name
+
+# Longest JSON kept for any one callback input, stores and figures can be megabytes
+MAX_INPUT_CHARS = 2000
+
+_lock = threading.Lock()
+_active = {}  # Thread id of every callback being answered to its stack sample counts
+_wake = threading.Event()  # Set while at least one callback is being answered
+_captures = deque(maxlen=PROFILER_CAPTURES)
+_ids = itertools.count(1)
+_sampler = None
+
+"""
+Sampling
+"""
+
+# Writes a thread's stack root first as one collapsed line, the format flamegraph tools read
+def collapse_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+# Samples the stack of every thread answering a callback, sleeping while there are none.
+# Work a callback hands to the fetch pool shows up as the request thread waiting on it
+def run_sampler():
+    while True:
+        _wake.wait()
+        frames = sys._current_frames()
+
+        with _lock:
+            for ident, stacks in _active.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    stacks[collapse_stack(frame)] += 1
+
+        del frames
+        time.sleep(PROFILER_INTERVAL)
+
+# Starts the sampler thread once per process
+def start_sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=run_sampler, name='callback-profiler', daemon=True)
+        _sampler.start()
+
+# Keeps a callback's inputs as short JSON strings
+def summarize_inputs(body):
+    inputs = {}
+    for item in body.get('inputs', []) + body.get('state', []):
+        if not isinstance(item, dict):
+            continue
+        text = json.dumps(item.get('value'), default=str)
+        if len(text) > MAX_INPUT_CHARS:
+            text = text[:MAX_INPUT_CHARS] + f'... ({len(text)} chars)'
+        inputs[f"{item.get('id')}.{item.get('property')}"] = text
+    return inputs
+
+"""
+Flask instrumentation
+"""
+
+# Only lets the admin endpoints answer requests carrying PROFILER_TOKEN, or local requests when no token is set
+def check_admin():
+    if PROFILER_TOKEN:
+        token = request.headers.get('X-Profiler-Token') or request.args.get('token') or ''
+        if not hmac.compare_digest(token, PROFILER_TOKEN):
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+
+# Profiles every Dash callback request on a Flask server, keeping the ones slower than the threshold. Off unless PROFILER=1
+def init_profiler(server):
+    if not PROFILER_ENABLED:
+        return
+
+    start_sampler()
+
+    @server.before_request
+    def start_profile():
+        if request.path.endswith('/_dash-update-component'):
+            g.profile_start = time.perf_counter()
+            with _lock:
+                _active[threading.get_ident()] = Counter()
+                _wake.set()
+
+    # The status is all that is taken from the response, a callback that raises never gets one
+    @server.after_request
+    def record_status(response):
+        if 'profile_start' in g:
+            g.profile_status = response.status_code
+        return response
+
+    # Teardown runs after every request, even one that raised, so a thread never stays in the sampled set
+    @server.teardown_request
+    def finish_profile(exc):
+        if 'profile_start' not in g:
+            return
+
+        duration = time.perf_counter() - g.profile_start
+        with _lock:
+            stacks = _active.pop(threading.get_ident(), Counter())
+            if not _active:
+                _wake.clear()
+
+        if duration >= PROFILER_THRESHOLD:
+            body = request.get_json(silent=True) or {}
+            capture = {'id': next(_ids),
+                       'callback': get_callback_name(body.get('output', 'unknown')),
+                       'started': time.time() - duration,
+                       'duration': duration,
+                       'status': g.get('profile_status', 500),
+                       'inputs': summarize_inputs(body),
+                       'samples': sum(stacks.values()),
+                       'stacks': stacks}
+
+            # The admin pages copy the captures under the same lock, a deque can't be appended to while iterated
+            with _lock:
+                _captures.append(capture)
+
+    # Every kept capture without its stacks, newest first
+    @server.route('/admin/slow-callbacks')
+    def list_slow_callbacks():
+        check_admin()
+        with _lock:
+            captures = list(_captures)
+        return jsonify([{key: value for key, value in capture.items() if key != 'stacks'}
+                        for capture in reversed(captures)])
+
+    # One capture's collapsed stacks, ready for flamegraph.pl or speedscope
+    @server.route('/admin/slow-callbacks/<int:capture_id>.folded')
+    def download_slow_callback(capture_id):
+        check_admin()
+        with _lock:
+            captures = list(_captures)
+        capture = next((capture for capture in captures if capture['id'] == capture_id), None)
+        if capture is None:
+            abort(404)
+
+        lines = ''.join(f'{stack} {count}\n' for stack, count in capture['stacks'].most_common())
+        return Response(lines, mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename=callback-{capture_id}.folded'})
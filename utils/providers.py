@@ -0,0 +1,376 @@
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from utils.config import market_sessions, intraday_limits, ticker_df, DATA_PROVIDER, PROVIDER_RECORD_DIR, PROVIDER_LATENCY, PROVIDER_SEED
+from utils.market_hours import get_ticker_market
+
+# Every provider answers the same three calls, shaped like yfinance's responses:
+#   download(ticker_list, interval_code, period_code, start) -> frame with (ticker, field) columns
+#   info(ticker) -> dictionary of Yahoo info fields
+#   news(ticker) -> list of Yahoo news articles
+
+"""
+Yahoo Finance
+"""
+
+# Live data from Yahoo, the only provider that is rate limited
+class YFinanceProvider:
+    rate_limited = True
+
+    def download(self, ticker_list, interval_code, period_code=None, start=None):
+        return yf.download(
+            ticker_list,
+            period=period_code if start is None else None,
+            start=start,
+            interval=interval_code,
+            group_by='ticker',
+            auto_adjust=True,
+            actions=True,
+            ignore_tz=False,
+            threads=True,
+            progress=False
+        )
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def news(self, ticker):
+        return yf.Ticker(ticker).news
+
+"""
+Record and replay
+"""
+
+# File a call's response is recorded under, one per ticker and, for downloads, per interval and period. Incremental
+# downloads (no period) share one recording per ticker and interval whatever bar they start from
+def get_recording_path(record_dir, method, ticker, interval_code=None, period_code=None):
+    parts = [ticker] if method != 'download' else [ticker, interval_code, period_code or 'incremental']
+    parts = [re.sub(r'[^\w.^=-]', '_', part) for part in parts]
+    return os.path.join(record_dir, method, *parts) + '.pkl'
+
+def read_recording(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+# Write then rename so a reader never sees half a file
+def write_recording(path, response):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(response, f, protocol=5)
+    os.replace(path + '.tmp', path)
+
+# Passes calls through to another provider and writes every response to disk for the replay provider
+class RecordingProvider:
+    def __init__(self, inner, record_dir):
+        self.inner = inner
+        self.record_dir = record_dir
+        self.rate_limited = inner.rate_limited
+        self._lock = threading.Lock()
+
+    def download(self, ticker_list, interval_code, period_code=None, start=None):
+        raw = self.inner.download(ticker_list, interval_code, period_code, start)
+
+        # Older yfinance versions return flat columns when only one ticker is downloaded
+        frames = raw if isinstance(raw.columns, pd.MultiIndex) else pd.concat({ticker_list[0]: raw}, axis=1)
+
+        with self._lock:
+            for ticker in dict.fromkeys(ticker_list):
+                if frames.empty or ticker not in frames.columns.get_level_values(0):
+                    continue
+
+                df = frames[ticker].dropna(how='all')
+                path = get_recording_path(self.record_dir, 'download', ticker, interval_code, period_code)
+
+                # Incremental responses add up, bars downloaded again replace the ones recorded before
+                if period_code is None and os.path.exists(path):
+                    recorded = read_recording(path)
+                    df = pd.concat([recorded[~recorded.index.isin(df.index)], df]).sort_index()
+
+                write_recording(path, df)
+
+        return raw
+
+    def info(self, ticker):
+        response = self.inner.info(ticker)
+        write_recording(get_recording_path(self.record_dir, 'info', ticker), response)
+        return response
+
+    def news(self, ticker):
+        response = self.inner.news(ticker)
+        write_recording(get_recording_path(self.record_dir, 'news', ticker), response)
+        return response
+
+# Waits a random time around a mean latency, so offline providers can stand in for a slow network
+def inject_latency(latency, rng, lock):
+    if latency <= 0:
+        return
+    with lock:
+        delay = rng.uniform(0.5 * latency, 1.5 * latency)
+    time.sleep(delay)
+
+# Answers calls from responses recorded earlier, a call that was never recorded raises LookupError
+class ReplayProvider:
+    rate_limited = False
+
+    def __init__(self, record_dir, latency=0.0, seed=0):
+        self.record_dir = record_dir
+        self.latency = latency
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def _replay(self, method, ticker):
+        path = get_recording_path(self.record_dir, method, ticker)
+        if not os.path.exists(path):
+            raise LookupError(f"No recorded {method} response for {ticker}")
+        return read_recording(path)
+
+    # Gets the bars recorded for a ticker and interval. Incremental downloads are served from the incremental
+    # recording, or when there is none from the longest period recorded, either cut to the bars from start onward
+    def _replay_bars(self, ticker, interval_code, period_code, start):
+        path = get_recording_path(self.record_dir, 'download', ticker, interval_code, period_code)
+
+        if period_code is None and not os.path.exists(path):
+            folder = os.path.dirname(path)
+            recorded = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.pkl')] if os.path.isdir(folder) else []
+            path = max(recorded, key=os.path.getsize, default=path)
+
+        if not os.path.exists(path):
+            raise LookupError(f"No recorded download for {ticker} at {interval_code} over {period_code or 'incremental'}")
+
+        df = read_recording(path)
+        return df if start is None else df[df.index >= start]
+
+    def download(self, ticker_list, interval_code, period_code=None, start=None):
+        inject_latency(self.latency, self._rng, self._lock)
+        return pd.concat({ticker: self._replay_bars(ticker, interval_code, period_code, start)
+                          for ticker in dict.fromkeys(ticker_list)}, axis=1)
+
+    def info(self, ticker):
+        inject_latency(self.latency, self._rng, self._lock)
+        return self._replay('info', ticker)
+
+    def news(self, ticker):
+        inject_latency(self.latency, self._rng, self._lock)
+        return self._replay('news', ticker)
+
+"""
+Synthetic data
+"""
+
+# First trading day of every synthetic history, prices are built forward from here so any window of a ticker agrees with any other
+SYNTHETIC_EPOCH = pd.Timestamp('2010-01-04')
+
+# Relative volume by weekday, Monday first, and how much busier the open and close are than midday
+weekday_volume = [1.1, 1.0, 0.95, 1.0, 1.05, 1.0, 0.9]
+OPEN_CLOSE_VOLUME = 1.5
+
+# How strongly synthetic prices pull back towards their starting level each day, keeps long histories in a realistic range
+MEAN_REVERSION = 0.998
+
+# Parameters of a ticker's synthetic series, fixed by its symbol so every run sees the same prices
+def get_synthetic_params(ticker, seed=0):
+    crc = zlib.crc32(ticker.encode())
+    return {'seed': crc + seed,
+            'price': 20.0 + crc % 480,
+            'volatility': 0.008 + (crc % 12) / 1000,
+            'volume': 1e6 * (1 + crc % 50)}
+
+# Gets the first local day a period covers
+def get_window_start(period_code, now):
+    if period_code == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    if period_code == 'max':
+        return SYNTHETIC_EPOCH.tz_localize(now.tz)
+
+    count, unit = re.fullmatch(r'(\d+)(d|wk|mo|y)', period_code).groups()
+    offset = {'d': pd.DateOffset(days=int(count)), 'wk': pd.DateOffset(weeks=int(count)),
+              'mo': pd.DateOffset(months=int(count)), 'y': pd.DateOffset(years=int(count))}[unit]
+    return (now - offset).normalize()
+
+# Daily opens, closes, extremes and volumes of every trading day from the epoch to a day, built from one random stream per ticker
+def make_synthetic_days(ticker, weekdays, last_day, seed=0):
+    params = get_synthetic_params(ticker, seed)
+
+    days = pd.date_range(SYNTHETIC_EPOCH, last_day, freq='D')
+    days = days[days.weekday.isin(weekdays)]
+
+    # The stream is drawn from the epoch every time, so a longer history starts with the same days as a shorter one
+    draws = np.random.default_rng(params['seed']).standard_normal((len(days), 4))
+    vol = params['volatility']
+
+    # Log prices wander around the starting price instead of drifting off over the years
+    shocks = vol * draws[:, 0]
+    log_level = np.empty(len(days))
+    level = 0.0
+    for i, shock in enumerate(shocks):
+        level = MEAN_REVERSION * level + shock
+        log_level[i] = level
+    close = params['price'] * np.exp(log_level)
+
+    # Overnight gaps move the open away from the previous close
+    prev_close = np.concatenate([[params['price']], close[:-1]])
+    open_ = prev_close * np.exp(0.3 * vol * draws[:, 1])
+
+    high = np.maximum(open_, close) * np.exp(0.5 * vol * np.abs(draws[:, 2]))
+    low = np.minimum(open_, close) * np.exp(-0.5 * vol * np.abs(draws[:, 3]))
+
+    seasonality = np.array(weekday_volume)[days.weekday]
+    volume = np.round(params['volume'] * seasonality * np.exp(0.3 * draws[:, 2]))
+
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=days)
+
+# Intraday bars of one session, a Brownian bridge from the day's open to its close with a U-shaped volume curve
+def make_synthetic_session(day_bars, day_number, session_open, steps, minutes, params):
+    rng = np.random.default_rng([params['seed'], day_number, minutes])
+    draws = rng.standard_normal((3, steps))
+    vol = params['volatility'] / np.sqrt(steps)
+
+    walk = np.concatenate([[0.0], np.cumsum(vol * draws[0])])
+    fraction = np.linspace(0, 1, steps + 1)
+    bridge = walk - fraction * walk[-1]
+
+    log_open, log_close = np.log(day_bars['Open']), np.log(day_bars['Close'])
+    path = np.exp(log_open + fraction * (log_close - log_open) + bridge)
+
+    open_, close = path[:-1], path[1:]
+    high = np.maximum(open_, close) * np.exp(0.5 * vol * np.abs(draws[1]))
+    low = np.minimum(open_, close) * np.exp(-0.5 * vol * np.abs(draws[2]))
+
+    midpoint = (np.arange(steps) + 0.5) / steps
+    shape = 1 + OPEN_CLOSE_VOLUME * (2 * midpoint - 1) ** 2
+    volume = np.round(day_bars['Volume'] * shape / shape.sum())
+
+    index = session_open + pd.to_timedelta(np.arange(steps) * minutes, unit='m')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+# Builds a ticker's bars for an interval over a window, on its market's sessions and timezone, in yfinance's column layout
+def make_synthetic_bars(ticker, interval_code, period_code=None, start=None, now=None, seed=0):
+    tz, weekdays, open_time, hours = market_sessions[get_ticker_market(ticker)]
+    now = pd.Timestamp.now(tz=tz) if now is None else now.tz_convert(tz)
+
+    days = make_synthetic_days(ticker, weekdays, now.tz_localize(None).normalize(), seed)
+
+    if start is not None:
+        window_start = pd.Timestamp(start)
+        window_start = window_start.tz_localize(tz) if window_start.tz is None else window_start.tz_convert(tz)
+    elif period_code is not None and re.fullmatch(r'\d+d', period_code):
+        # Yahoo's day periods count sessions rather than calendar days
+        window_start = days.index[-int(period_code[:-1]):][0].tz_localize(tz)
+    else:
+        window_start = get_window_start(period_code or '1mo', now)
+
+    # Yahoo only serves a limited history of intraday bars
+    if interval_code in intraday_limits:
+        window_start = max(window_start, now - pd.Timedelta(days=intraday_limits[interval_code]))
+
+    minutes = int(interval_code[:-1]) if interval_code.endswith('m') and interval_code[:-1].isdigit() else None
+
+    if minutes is None:
+        bars = days.copy()
+        bars.index = bars.index.tz_localize(tz)
+        bars = bars[(bars.index >= window_start.normalize()) & (bars.index <= now)]
+    else:
+        params = get_synthetic_params(ticker, seed)
+        steps = int(hours * 60 // minutes)
+        open_offset = pd.Timedelta(open_time + ':00')
+
+        sessions = []
+        for day_number in np.flatnonzero(days.index >= window_start.tz_localize(None).normalize()):
+            day = days.index[day_number]
+            session_open = (day + open_offset).tz_localize(tz)
+            if session_open > now:
+                continue
+            sessions.append(make_synthetic_session(days.iloc[day_number], day_number, session_open, steps, minutes, params))
+
+        bars = pd.concat(sessions) if sessions else pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        bars = bars[(bars.index >= window_start) & (bars.index <= now)]
+
+    bars = bars.assign(Dividends=0.0, **{'Stock Splits': 0.0})
+    bars.index.name = 'Datetime' if minutes is not None else 'Date'
+    return bars
+
+# Generates deterministic prices, info and news locally, with an optional injected latency per call
+class SyntheticProvider:
+    rate_limited = False
+
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def download(self, ticker_list, interval_code, period_code=None, start=None):
+        inject_latency(self.latency, self._rng, self._lock)
+
+        frames = {ticker: make_synthetic_bars(ticker, interval_code, period_code, start, seed=self.seed)
+                  for ticker in ticker_list}
+        raw = pd.concat(frames, axis=1)
+        raw.index = pd.DatetimeIndex(raw.index).tz_convert('UTC')
+        return raw
+
+    def info(self, ticker):
+        inject_latency(self.latency, self._rng, self._lock)
+
+        params = get_synthetic_params(ticker, self.seed)
+        listing = ticker_df[ticker_df['Symbol'] == ticker]
+        sectors = ['Technology', 'Healthcare', 'Financial Services', 'Energy', 'Industrials', 'Consumer Cyclical']
+
+        return {'symbol': ticker,
+                'sector': sectors[params['seed'] % len(sectors)],
+                'industry': 'Synthetic',
+                'currency': 'CAD' if get_ticker_market(ticker) == 'CA' else 'USD',
+                'exchange': listing['Exchange'].iloc[0] if not listing.empty else 'SYN',
+                'marketCap': params['price'] * params['volume'] * 100}
+
+    # A few articles per ticker, a new one appears every hour
+    def news(self, ticker):
+        inject_latency(self.latency, self._rng, self._lock)
+
+        latest = pd.Timestamp.now(tz='UTC').floor('h')
+        articles = []
+        for hours_ago in range(5):
+            published = latest - pd.Timedelta(hours=hours_ago)
+            article_id = f'{ticker}-{published:%Y%m%d%H}'
+            articles.append({'id': article_id,
+                             'content': {'id': article_id,
+                                         'title': f'{ticker} synthetic update {published:%b %d %H:%M}',
+                                         'pubDate': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                         'canonicalUrl': {'url': f'https://example.com/{article_id}'},
+                                         'thumbnail': {'originalUrl': 'https://example.com/thumbnail.png'}}})
+        return articles
+
+"""
+Provider selection
+"""
+
+_provider = None
+
+# Builds the provider named by DATA_PROVIDER: 'yfinance', 'record', 'replay' or 'synthetic'
+def make_provider(name=DATA_PROVIDER):
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'record':
+        return RecordingProvider(YFinanceProvider(), PROVIDER_RECORD_DIR)
+    if name == 'replay':
+        return ReplayProvider(PROVIDER_RECORD_DIR, latency=PROVIDER_LATENCY, seed=PROVIDER_SEED)
+    if name == 'synthetic':
+        return SyntheticProvider(latency=PROVIDER_LATENCY, seed=PROVIDER_SEED)
+    raise ValueError(f"Unknown data provider: {name}")
+
+# Gets the provider every fetcher goes through
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = make_provider()
+    return _provider
+
+# Swaps the provider, for benchmarks and load tests running in process
+def set_provider(provider):
+    global _provider
+    _provider = provider
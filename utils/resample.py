@@ -0,0 +1,85 @@
+import re
+import numpy as np
+import pandas as pd
+
+# How each column of a bar combines when several bars are merged into one
+ohlc_aggregation = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'max'
+}
+
+# Intraday buckets are counted from the 9:30 open so they line up with the bars Yahoo builds
+session_open = pd.Timedelta(hours=9, minutes=30)
+
+"""
+Interval parsing
+"""
+
+# Splits a Yahoo style interval code such as '5m', '2h', '1wk' or '3mo' into its count and unit
+def parse_interval(interval_code):
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval_code)
+    if match is None:
+        raise ValueError(f"Unsupported interval: {interval_code}")
+
+    count, unit = int(match.group(1)), match.group(2)
+
+    # Hours are just a multiple of minutes
+    if unit == 'h':
+        return count * 60, 'm'
+    return count, unit
+
+# Whether an interval is shorter than a day
+def is_intraday(interval_code):
+    return parse_interval(interval_code)[1] == 'm'
+
+# Whether bars of one interval can be built by merging whole bars of a finer interval
+def can_resample(base_code, interval_code):
+    base_count, base_unit = parse_interval(base_code)
+    count, unit = parse_interval(interval_code)
+
+    # Intraday bars build intraday bars of a multiple length, daily bars build every daily or longer interval
+    if unit == 'm':
+        return base_unit == 'm' and count % base_count == 0
+    return base_unit == 'd' and base_count == 1
+
+"""
+Resampling
+"""
+
+# Builds coarser OHLCV bars from finer ones, intraday buckets restart at every session open
+def resample_ohlc(df, interval_code):
+    if df.empty:
+        return df
+
+    count, unit = parse_interval(interval_code)
+    agg = {col: how for col, how in ohlc_aggregation.items() if col in df.columns}
+
+    if unit == 'm':
+        # Each bar goes into the bucket counted from its own day's open, so no bucket spans two sessions
+        freq = pd.Timedelta(minutes=count)
+        anchor = df.index.normalize() + session_open
+        buckets = anchor + ((df.index - anchor) // freq) * freq
+        bars = df.groupby(buckets).agg(agg)
+    elif unit == 'd':
+        # Yahoo's multi-day bars are groups of N trading days counted from the start of the period
+        chunks = np.arange(len(df)) // count
+        bars = df.groupby(chunks).agg(agg)
+        bars.index = df.index[np.unique(chunks, return_index=True)[1]]
+    elif unit == 'wk':
+        # Weeks are labelled by their Monday
+        bars = df.resample(f'{count}W-MON', label='left', closed='left').agg(agg)
+    elif count == 3:
+        # Quarters follow the calendar
+        bars = df.resample('QS-JAN').agg(agg)
+    else:
+        bars = df.resample(f'{count}MS').agg(agg)
+
+    bars.index.name = df.index.name
+
+    # Weeks or months with no trading leave empty buckets behind
+    return bars.dropna(subset=['Close'])
@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from utils.config import STORE_PATH
+
+# Columns kept for every bar, matching the frames yfinance returns
+ohlc_columns = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+_local = threading.local()
+
+"""
+Connection handling
+"""
+
+# Gets this thread's connection to the on-disk store, creating the database and tables on first use
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+
+    os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+    conn = sqlite3.connect(STORE_PATH, timeout=30)
+
+    # WAL lets every worker process read while one of them is writing
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ohlc (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                dividends REAL, splits REAL,
+                PRIMARY KEY (ticker, interval, ts)
+            ) WITHOUT ROWID''')
+
+        # One row per (ticker, interval) describing what the store holds
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ohlc_meta (
+                ticker TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                tz TEXT,
+                covered_from INTEGER,
+                last_ts INTEGER,
+                updated REAL,
+                PRIMARY KEY (ticker, interval)
+            )''')
+
+        # Compact per-symbol metadata, the only fields the dashboard reads from Yahoo's info lookups
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ticker_meta (
+                ticker TEXT PRIMARY KEY,
+                sector TEXT,
+                industry TEXT,
+                currency TEXT,
+                exchange TEXT,
+                market_cap REAL,
+                updated REAL
+            )''')
+
+        # News articles keyed by the provider's article ID, an article about several tickers is stored once
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS news (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                link TEXT,
+                image TEXT,
+                published INTEGER
+            )''')
+
+        # Which tickers each article was listed under, indexed by time for the news cards
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS news_tickers (
+                ticker TEXT NOT NULL,
+                id TEXT NOT NULL,
+                published INTEGER,
+                PRIMARY KEY (ticker, id)
+            ) WITHOUT ROWID''')
+        conn.execute('CREATE INDEX IF NOT EXISTS news_tickers_published ON news_tickers (ticker, published DESC)')
+
+        # Per-ticker high-water mark, the newest article stored and when the provider was last checked
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS news_meta (
+                ticker TEXT PRIMARY KEY,
+                last_published INTEGER,
+                checked REAL
+            )''')
+
+    _local.conn = conn
+    return conn
+
+"""
+OHLC bars
+"""
+
+# Gets what the store holds for a ticker and interval, or None if it has never been fetched
+def get_store_info(ticker, interval):
+    row = get_connection().execute(
+        'SELECT tz, covered_from, last_ts, updated FROM ohlc_meta WHERE ticker = ? AND interval = ?',
+        (ticker, interval)).fetchone()
+
+    if row is None:
+        return None
+
+    tz, covered_from, last_ts, updated = row
+    return {'tz': tz,
+            'covered_from': pd.Timestamp(covered_from, tz='UTC').tz_convert(tz),
+            'last_ts': pd.Timestamp(last_ts, tz='UTC').tz_convert(tz) if last_ts is not None else None,
+            'updated': updated}
+
+# Loads every stored bar for a ticker and interval as a frame indexed in the exchange timezone
+def load_bars(ticker, interval):
+    info = get_store_info(ticker, interval)
+    if info is None:
+        return pd.DataFrame()
+
+    rows = get_connection().execute(
+        'SELECT ts, open, high, low, close, volume, dividends, splits FROM ohlc '
+        'WHERE ticker = ? AND interval = ? ORDER BY ts',
+        (ticker, interval)).fetchall()
+
+    if not rows:
+        return pd.DataFrame(columns=ohlc_columns)
+
+    df = pd.DataFrame.from_records(rows, columns=['ts'] + ohlc_columns)
+    df.index = pd.to_datetime(df.pop('ts'), utc=True).dt.tz_convert(info['tz'])
+    df.index.name = 'Date'
+
+    return df
+
+# Writes bars for a ticker and interval, newer copies of an existing timestamp overwrite the stored bar
+def save_bars(ticker, interval, df, covered_from=None, replace=False):
+    if df.empty:
+        return
+
+    conn = get_connection()
+    df = df.reindex(columns=ohlc_columns).fillna({'Dividends': 0.0, 'Stock Splits': 0.0})
+    ts = df.index.tz_convert('UTC').as_unit('ns').asi8
+
+    rows = zip((ticker,) * len(df), (interval,) * len(df), ts.tolist(), *(df[c].tolist() for c in ohlc_columns))
+
+    with conn:
+        if replace:
+            conn.execute('DELETE FROM ohlc WHERE ticker = ? AND interval = ?', (ticker, interval))
+
+        conn.executemany('INSERT OR REPLACE INTO ohlc VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+        # Keep the earliest window we know is complete, unless the history was just replaced
+        info = None if replace else get_store_info(ticker, interval)
+        if covered_from is None:
+            covered_from = info['covered_from'] if info else df.index[0]
+        elif info is not None:
+            covered_from = min(covered_from, info['covered_from'])
+
+        last_ts = conn.execute('SELECT MAX(ts) FROM ohlc WHERE ticker = ? AND interval = ?',
+                               (ticker, interval)).fetchone()[0]
+
+        conn.execute('INSERT OR REPLACE INTO ohlc_meta VALUES (?, ?, ?, ?, ?, ?)',
+                     (ticker, interval, str(df.index.tz), pd.Timestamp(covered_from).value, last_ts, time.time()))
+
+"""
+Ticker metadata
+"""
+
+# Fields stored for every ticker
+metadata_columns = ['sector', 'industry', 'currency', 'exchange', 'market_cap']
+
+# Loads the stored metadata of a list of tickers as a dictionary keyed by ticker, tickers never stored are left out
+def load_ticker_metadata(ticker_list):
+    conn = get_connection()
+    metadata = {}
+
+    # Stay under SQLite's limit on query parameters
+    ticker_list = list(ticker_list)
+    for i in range(0, len(ticker_list), 500):
+        chunk = ticker_list[i:i + 500]
+        rows = conn.execute(
+            f'SELECT ticker, {", ".join(metadata_columns)}, updated FROM ticker_meta '
+            f'WHERE ticker IN ({", ".join("?" * len(chunk))})', chunk).fetchall()
+
+        for row in rows:
+            metadata[row[0]] = dict(zip(metadata_columns + ['updated'], row[1:]))
+
+    return metadata
+
+# Writes metadata for tickers, a dictionary of ticker to a dictionary of metadata fields
+def save_ticker_metadata(metadata):
+    conn = get_connection()
+    now = time.time()
+
+    rows = [(ticker, *(fields.get(col) for col in metadata_columns), now) for ticker, fields in metadata.items()]
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO ticker_meta VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+"""
+News
+"""
+
+# Fields stored for every article
+news_columns = ['title', 'link', 'image']
+
+# Gets each ticker's news high-water mark as a dictionary of ticker to (newest published time, last checked), tickers never checked are left out
+def get_news_marks(ticker_list):
+    conn = get_connection()
+    marks = {}
+
+    ticker_list = list(ticker_list)
+    for i in range(0, len(ticker_list), 500):
+        chunk = ticker_list[i:i + 500]
+        rows = conn.execute(
+            f'SELECT ticker, last_published, checked FROM news_meta WHERE ticker IN ({", ".join("?" * len(chunk))})',
+            chunk).fetchall()
+
+        for ticker, last_published, checked in rows:
+            marks[ticker] = (last_published, checked)
+
+    return marks
+
+# Writes a ticker's newly seen articles, a list of dictionaries with an id, published time in epoch ns and the news columns.
+# Articles already stored are left alone, and the ticker's high-water mark moves up to the newest article. Returns how many were new
+def save_news(ticker, articles):
+    conn = get_connection()
+
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO news VALUES (?, ?, ?, ?, ?)',
+                         [(a['id'], *(a.get(col) for col in news_columns), a['published']) for a in articles])
+        inserted = conn.executemany('INSERT OR IGNORE INTO news_tickers VALUES (?, ?, ?)',
+                                    [(ticker, a['id'], a['published']) for a in articles]).rowcount
+
+        last_published = conn.execute('SELECT MAX(published) FROM news_tickers WHERE ticker = ?', (ticker,)).fetchone()[0]
+        conn.execute('INSERT OR REPLACE INTO news_meta VALUES (?, ?, ?)', (ticker, last_published, time.time()))
+
+    return max(inserted, 0)
+
+# Loads the newest articles of each ticker, newest first across all of them and each article only once
+def load_news(ticker_list, article_amnt):
+    conn = get_connection()
+    articles = {}
+
+    for ticker in dict.fromkeys(ticker_list):
+        rows = conn.execute(
+            'SELECT n.id, n.title, n.link, n.image, n.published FROM news_tickers t JOIN news n ON n.id = t.id '
+            'WHERE t.ticker = ? ORDER BY t.published DESC LIMIT ?', (ticker, article_amnt)).fetchall()
+
+        for row in rows:
+            articles.setdefault(row[0], row)
+
+    return sorted(articles.values(), key=lambda row: row[4] or 0, reverse=True)
@@ -0,0 +1,336 @@
+import bisect
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from utils.config import period_map, valid_intervals_map, VWAP_ENGINES
+from utils.data import get_period_start
+from utils.tech import get_intraday_vwap, detect_vwap_events
+
+# Columns the engine adds to a frame, the same ones get_intraday_vwap and detect_vwap_events add and in the same order
+vwap_columns = ['Typical Price', 'Date', 'Cumulative Volume', 'TP Volume', 'Cum TP Volume', 'VWAP', 'Deviation',
+                'VWAP Std', 'VWAP Z Score', 'VWAP Event', 'Max Z Distance']
+
+# Every column kept per bar and its dtype, the OHLCV values are kept to notice when a bar is revised
+engine_columns = {'Open': float, 'High': float, 'Low': float, 'Close': float, 'Volume': float,
+                  'Typical Price': float, 'Date': object, 'Cumulative Volume': float, 'TP Volume': float,
+                  'Cum TP Volume': float, 'VWAP': float, 'Deviation': float, 'VWAP Std': float,
+                  'VWAP Z Score': float, 'VWAP Event': bool, 'Max Z Distance': object}
+
+# Running values that describe the current session, copied before every bar so the last one can be rolled back
+state_fields = ['date', 'cum_volume', 'cum_tp_volume', 'count', 'mean', 'm2',
+                'event_date', 'prev_z', 'has_extended', 'reset_next', 'max_z', 'min_z']
+
+"""
+Streaming VWAP
+"""
+
+# Position of the first bar of the session the bar before stop belongs to
+def get_session_start(dates, stop):
+    same = dates[:stop] == dates[stop - 1]
+    return stop - int(np.argmin(same[::-1])) if not same.all() else 0
+
+# VWAP, its σ bands and snapback events of one ticker at one interval, kept up to date one bar at a time. Gives the same
+# values as running get_intraday_vwap and detect_vwap_events over every bar it has seen
+class StreamingVWAP:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    # Forgets every bar
+    def reset(self):
+        self.size = 0
+        self.times = []
+        self.columns = {name: np.empty(64, dtype=dtype) for name, dtype in engine_columns.items()}
+
+        self.date = None
+        self.cum_volume = self.cum_tp_volume = 0.0
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0  # Welford moments of the session's deviations from VWAP
+
+        # Snapback state, folded in bar order once a bar's z-score is final
+        self.event_date = None
+        self.prev_z = math.nan
+        self.has_extended = False
+        self.reset_next = False
+        self.max_z = self.min_z = None
+
+        # Bars still without a std, the first one of a session gets the std of the first bar after it that has one
+        self.pending = []
+        self.snapshot = None
+        self.new_events = []
+
+    # Starts over from a frame of bars, calculated in one vectorized pass and then picked up where the running values
+    # of its last session leave off
+    def seed(self, ohlc_df):
+        self.reset()
+        n = len(ohlc_df)
+        if n == 0:
+            return
+
+        vwap_df = detect_vwap_events(get_intraday_vwap(ohlc_df))
+        self.reserve(n)
+        self.size = n
+        self.times = list(ohlc_df.index)
+        for name in engine_columns:
+            self.columns[name][:n] = vwap_df[name].to_numpy()
+
+        columns = self.columns
+        dates, z = columns['Date'][:n], columns['VWAP Z Score'][:n]
+
+        # Bars at the end without a std are still waiting for one
+        folded = n
+        while folded and columns['VWAP Std'][folded - 1] != columns['VWAP Std'][folded - 1]:
+            folded -= 1
+        self.pending = list(range(folded, n))
+
+        # Running sums and deviation moments of the last session
+        start = get_session_start(dates, n)
+        deviation = columns['Deviation'][start:n]
+        deviation = deviation[~np.isnan(deviation)]
+        self.date = dates[n - 1]
+        self.cum_volume = float(np.nansum(columns['Volume'][start:n]))
+        self.cum_tp_volume = float(np.nansum(columns['TP Volume'][start:n]))
+        self.count = len(deviation)
+        self.mean = float(deviation.mean()) if self.count else 0.0
+        self.m2 = float(((deviation - self.mean) ** 2).sum())
+
+        if not folded:
+            return
+
+        # Snapback state as of the last bar with a z-score, an extension counts from after the last crossing before it
+        last = folded - 1
+        start = get_session_start(dates, folded)
+        day_z = z[start:folded]
+        crosses = np.flatnonzero(day_z[1:] * day_z[:-1] < 0) + 1
+        segment = crosses[crosses < len(day_z) - 1]
+
+        self.event_date = dates[last]
+        self.prev_z = float(z[last])
+        self.reset_next = bool(len(crosses)) and crosses[-1] == len(day_z) - 1
+        self.has_extended = bool((np.abs(day_z[segment[-1] + 1 if len(segment) else 0:]) > 2).any())
+        if not np.isnan(day_z).all():
+            self.max_z, self.min_z = float(np.nanmax(day_z)), float(np.nanmin(day_z))
+
+    # Grows every column to hold at least size bars, doubling so appends stay O(1) on average
+    def reserve(self, size):
+        capacity = len(self.columns['Close'])
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+
+    # Folds a bar with its final z-score into the snapback state, returns the event it completes or None
+    def fold(self, i):
+        columns = self.columns
+        date, z = columns['Date'][i], columns['VWAP Z Score'][i]
+
+        # Everything restarts each day, and an extension only counts towards the first crossing after it
+        same_day = date == self.event_date
+        if not same_day:
+            self.event_date, self.prev_z, self.max_z, self.min_z = date, math.nan, None, None
+        if not same_day or self.reset_next:
+            self.has_extended = False
+
+        cross = same_day and self.prev_z * z < 0
+        self.has_extended = self.has_extended or abs(z) > 2
+        if z == z:
+            self.max_z = z if self.max_z is None else max(self.max_z, z)
+            self.min_z = z if self.min_z is None else min(self.min_z, z)
+
+        self.reset_next = cross
+        self.prev_z = z
+
+        if not (cross and self.has_extended):
+            return None
+
+        max_distance = self.max_z if abs(self.max_z) >= abs(self.min_z) else self.min_z
+        columns['VWAP Event'][i] = True
+        columns['Max Z Distance'][i] = max_distance
+        return {'time': self.times[i], 'Close': columns['Close'][i], 'Max Z Distance': max_distance}
+
+    # Adds the next bar in O(1), returns the snapback event it completes or None
+    def append(self, time, open_price, high, low, close, volume):
+        self.snapshot = ({field: getattr(self, field) for field in state_fields}, list(self.pending))
+
+        i = self.size
+        self.reserve(i + 1)
+        self.size += 1
+        self.times.append(time)
+
+        columns = self.columns
+        for name, value in (('Open', open_price), ('High', high), ('Low', low), ('Close', close), ('Volume', volume)):
+            columns[name][i] = value
+
+        # Sums restart every session, a missing value leaves them untouched like a skipped row in a cumulative sum
+        date = time.date()
+        if date != self.date:
+            self.date = date
+            self.cum_volume = self.cum_tp_volume = 0.0
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+
+        typical_price = (high + low + close) / 3
+        tp_volume = typical_price * volume
+        if volume == volume:
+            self.cum_volume += volume
+        if tp_volume == tp_volume:
+            self.cum_tp_volume += tp_volume
+        cum_volume = self.cum_volume if volume == volume else math.nan
+        cum_tp_volume = self.cum_tp_volume if tp_volume == tp_volume else math.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = float(np.float64(cum_tp_volume) / cum_volume)
+        deviation = close - vwap
+
+        # Welford's update of the deviation's mean and sum of squared differences, sample std once there are two
+        std = math.nan
+        if deviation == deviation:
+            self.count += 1
+            delta = deviation - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (deviation - self.mean)
+            if self.count > 1:
+                std = math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+        for name, value in (('Typical Price', typical_price), ('Date', date), ('Cumulative Volume', cum_volume),
+                            ('TP Volume', tp_volume), ('Cum TP Volume', cum_tp_volume), ('VWAP', vwap),
+                            ('Deviation', deviation), ('VWAP Std', std), ('VWAP Z Score', math.nan),
+                            ('VWAP Event', False), ('Max Z Distance', None)):
+            columns[name][i] = value
+
+        # Without a std the bar waits, its z-score isn't known until a later bar backfills one
+        self.pending.append(i)
+        if std != std:
+            return None
+
+        event = None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for j in self.pending:
+                columns['VWAP Std'][j] = std
+                columns['VWAP Z Score'][j] = float(np.float64(columns['Deviation'][j]) / std)
+                event = self.fold(j)
+        self.pending = []
+
+        return event
+
+    # Takes back the last bar, only one level deep
+    def pop(self):
+        state, pending = self.snapshot
+        for field, value in state.items():
+            setattr(self, field, value)
+
+        # Bars the last one gave a std to go back to waiting
+        for j in pending:
+            self.columns['VWAP Std'][j] = math.nan
+            self.columns['VWAP Z Score'][j] = math.nan
+        self.pending = pending
+
+        self.size -= 1
+        self.times.pop()
+        self.snapshot = None
+
+    # Drops every bar before a position, which must be the first bar of a session
+    def trim(self, start):
+        if start <= 0:
+            return
+
+        for name, values in self.columns.items():
+            values[:self.size - start] = values[start:self.size].copy()
+        self.size -= start
+        del self.times[:start]
+        self.pending = [j - start for j in self.pending if j >= start]
+        self.snapshot = None
+
+    # Checks a bar of a frame against the one kept, revised values mean it has to be recalculated
+    def matches(self, i, row):
+        kept = np.array([self.columns[name][i] for name in ('Open', 'High', 'Low', 'Close', 'Volume')])
+        return bool(np.array_equal(kept, row, equal_nan=True))
+
+    # Brings the engine up to date with the bars of a frame and returns the frame with every VWAP column. Only bars
+    # newer than the ones kept are added and a revised last bar is rolled back and re-added, anything else starts over.
+    # Snapback events the new bars complete are left in new_events
+    def update(self, ohlc_df, keep_from=None):
+        with self.lock:
+            index = ohlc_df.index
+            values = ohlc_df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=float)
+
+            # Where the frame starts among the kept bars and where the last kept bar is in the frame
+            start = bisect.bisect_left(self.times, index[0]) if len(index) else 0
+            last = index.searchsorted(self.times[-1]) if self.size else 0
+            synced = (self.size > 0 and start < self.size and self.times[start] == index[0]
+                      and last < len(index) and index[last] == self.times[-1]
+                      and self.size - start == last + 1 and self.matches(start, values[0]))
+
+            if synced and not self.matches(self.size - 1, values[last]):
+                synced = self.snapshot is not None
+                if synced:
+                    self.pop()
+                    last -= 1
+
+            # Starting over is vectorized up to the last bar, which is appended so it can still be rolled back
+            if not synced:
+                self.seed(ohlc_df.iloc[:-1])
+                start, last = 0, len(index) - 2
+
+            self.new_events = []
+            for time, (open_price, high, low, close, volume) in zip(index[last + 1:], values[last + 1:].tolist()):
+                event = self.append(time, open_price, high, low, close, volume)
+                if event is not None:
+                    self.new_events.append(event)
+
+            result = self.get_frame(ohlc_df, start)
+
+            # Bars older than any window still asked for are dropped, whole sessions at a time
+            if keep_from is not None:
+                self.trim(bisect.bisect_left(self.times, keep_from))
+
+            return result
+
+    # Gets a frame with the VWAP columns of the kept bars from a position onwards attached
+    def get_frame(self, ohlc_df, start):
+        df = ohlc_df.drop('Date', axis=1) if 'Date' in ohlc_df.columns else ohlc_df.copy()
+        df.index.name = None
+
+        stop = start + len(df)
+        columns = pd.DataFrame({name: self.columns[name][start:stop].copy() for name in vwap_columns}, index=df.index)
+
+        return pd.concat([df, columns], axis=1)
+
+"""
+Engine registry
+"""
+
+_lock = threading.Lock()
+_engines = OrderedDict()  # (ticker, interval) to its engine, least recently used first
+
+# Gets the earliest bar any period offering an interval can start at, older bars are never shown at that interval
+def get_keep_from(interval, tz):
+    periods = [period for period, intervals in valid_intervals_map.items() if interval in intervals]
+    if not periods:
+        return None
+    return min(get_period_start(period_map[period], tz) for period in periods)
+
+# Gets the engine of a ticker at an interval, the least recently used one is dropped past VWAP_ENGINES
+def get_vwap_engine(ticker, interval):
+    key = (ticker, interval)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = StreamingVWAP()
+        _engines.move_to_end(key)
+
+        while len(_engines) > VWAP_ENGINES:
+            _engines.popitem(last=False)
+
+    return engine
+
+# Gets a ticker's OHLC frame with VWAP, σ bands and snapback events, the streaming version of running get_intraday_vwap
+# then detect_vwap_events
+def get_streaming_vwap(ticker, interval, ohlc_df):
+    keep_from = get_keep_from(interval, ohlc_df.index.tz)
+    return get_vwap_engine(ticker, interval).update(ohlc_df, keep_from)
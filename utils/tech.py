@@ -10,9 +10,6 @@ VWAP Related Functions
 def get_intraday_vwap(ohlc_df):
     df = ohlc_df.copy()
 
-    # Calculate typical price (used as it more accurately represents price than just close)
-    df['Typical Price'] = (df['High'] + df['Low'] + df['Close']) / 3
-
     # Remove any existing 'Date' column and clear index name
     if 'Date' in df.columns:
         df = df.drop('Date', axis=1)
@@ -20,22 +17,44 @@ def get_intraday_vwap(ohlc_df):
     # Clear the index name completely to avoid ambiguity
     df.index.name = None
 
-    # Find specific day, group the cumulative volume based on each day (resets for each cumulaitve)
-    df['Date'] = pd.to_datetime(df.index).date
-    df['Cumulative Volume'] = df.groupby('Date')['Volume'].cumsum()
+    # Calculate typical price (used as it more accurately represents price than just close)
+    close, volume = df['Close'].to_numpy(), df['Volume'].to_numpy()
+    typical_price = (df['High'].to_numpy() + df['Low'].to_numpy() + close) / 3
 
-    # Calculate VWAP at each price using: Sum of (Typical Price * Volume) / Sum of Volume
-    df['TP Volume'] = (df['Typical Price'] * df['Volume'])
-    df['Cum TP Volume'] = df.groupby('Date')['TP Volume'].cumsum()
-    df['VWAP'] = df['Cum TP Volume'] / df['Cumulative Volume']
+    # Find specific day, every cumulative sum below restarts at the start of each day. Dates are built once per day
+    # and shared by its rows, building one per row would dominate the whole function
+    index = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.to_datetime(df.index)
+    day, days = pd.factorize(index.normalize())
 
-    # Calculate standard deviation of price from VWAP and the z-score of each price
-    df['Deviation'] = df['Close'] - df['VWAP']
-    df['VWAP Std'] = df.groupby('Date')['Deviation'].expanding().std().reset_index(level=0, drop=True)
-    df['VWAP Std'] = df['VWAP Std'].bfill()
-    df['VWAP Z Score'] = df['Deviation'] / df['VWAP Std']
+    # Calculate VWAP at each price using: Sum of (Typical Price * Volume) / Sum of Volume, both sums in one grouped pass
+    tp_volume = typical_price * volume
+    cum_volume, cum_tp_volume = pd.DataFrame({'Volume': volume, 'TP Volume': tp_volume}).groupby(day).cumsum().to_numpy().T
+    vwap = cum_tp_volume / cum_volume
 
-    return df
+    # Calculate standard deviation of price from VWAP and the z-score of each price
+    deviation = close - vwap
+
+    # Expanding sample std from running sums of x and x squared, x measured from the day's first deviation so the sums
+    # stay small and subtracting them doesn't lose precision
+    shifted = deviation - pd.Series(deviation).groupby(day).first().to_numpy()[day]
+    count, total, total_sq = pd.DataFrame({'n': ~np.isnan(shifted), 'sum': shifted, 'sum sq': shifted ** 2}
+                                          ).groupby(day).cumsum().to_numpy(dtype=float).T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (total_sq - total ** 2 / count) / (count - 1)
+    vwap_std = np.where(count > 1, np.sqrt(np.maximum(variance, 0)), np.nan)
+    vwap_std = pd.Series(vwap_std).bfill().to_numpy()
+
+    vwap_columns = pd.DataFrame({'Typical Price': typical_price,
+                                 'Date': days.date[day],
+                                 'Cumulative Volume': cum_volume,
+                                 'TP Volume': tp_volume,
+                                 'Cum TP Volume': cum_tp_volume,
+                                 'VWAP': vwap,
+                                 'Deviation': deviation,
+                                 'VWAP Std': vwap_std,
+                                 'VWAP Z Score': deviation / vwap_std}, index=df.index)
+
+    return pd.concat([df, vwap_columns], axis=1)
 
 # Detects VWAP snapback/reversal events, when Z-score is larger than 1 (more than 1 std) and then comes back and crosses VWAP
 def detect_vwap_events(vwap_df):
@@ -49,26 +68,14 @@ def detect_vwap_events(vwap_df):
     same_day = df['Date'] == df['Date'].shift(1)
     valid_cross = cross_zero & same_day
 
-    df['VWAP Event'] = False
-    has_extended = False
-    current_date = None
-
-    # Loop through each day to detect snapback events: must have has_extended be true and a valid cross
-    for i in df.index:
-
-        # Reset has_extended on a new day
-        if df['Date'].loc[i] != current_date:
-            has_extended = False
-            current_date = df['Date'].loc[i]
+    # has_extended only resets on a new day or after a valid crossing (a crossing without an extension leaves it unset
+    # anyway), so every stretch between resets is a group and has_extended is a running "any" of extended inside it
+    new_day = df['Date'] != df['Date'].shift(1)
+    segment = (new_day | valid_cross.shift(1, fill_value=False)).cumsum()
+    has_extended = extended.groupby(segment).cummax().astype(bool)
 
-        # Check if extended
-        if extended.loc[i]:
-            has_extended = True
-        
-        # Check if its a valid crossing, if so mark that VWAP event down and reset has_extended
-        if valid_cross.loc[i] and has_extended:
-            df.loc[i, 'VWAP Event'] = True
-            has_extended = False
+    # A snapback is a valid crossing after an extension within the same stretch
+    df['VWAP Event'] = valid_cross & has_extended
 
     # Track maximum and minimum z score seen so far and then find the maximum extension/distance
     cummax = df.groupby('Date', observed=True)['VWAP Z Score'].cummax()
@@ -85,54 +92,126 @@ def detect_vwap_events(vwap_df):
 Volume Profile 
 """
 
-# Calculates basic volume profile by splitting prices into bins and finding total volume for each bin
-def get_volume_profile(ohlc_df, num_bins=50):
-    df = ohlc_df.copy()
-
-    # Creates bins
-    df['Price Bin'] = pd.cut(df['Close'], bins=num_bins)
-    
-    # Group and aggregate the data
-    profile = df.groupby('Price Bin').agg({
-        'Volume': 'sum',
-        'Close': 'mean'
-    }).reset_index()
-        
-    return profile.rename({'Volume': 'Total Volume', 'Close': 'Avg Price'}, axis=1).dropna()
+# Gets the edges of equal width price bins over a range, made the way pd.cut makes them: the lowest edge sits a little
+# below the minimum so it falls in the first bin, and a range without width is widened around its price
+def get_price_bins(low, high, num_bins):
+    if low == high:
+        low -= 0.001 * abs(low) if low != 0 else 0.001
+        high += 0.001 * abs(high) if high != 0 else 0.001
+        return np.linspace(low, high, num_bins + 1)
+
+    edges = np.linspace(low, high, num_bins + 1)
+    edges[0] -= (high - low) * 0.001
+    return edges
+
+# Gets the volume and the volume times price at or below each edge when every bar's volume is spread evenly from its
+# Low to its High. Both only change shape at bar lows and highs, so they come from prefix sums over the sorted lows and
+# highs instead of overlapping every bar with every bin. Prices are measured from the lowest edge to keep the sums small
+def get_range_distribution(low, high, volume, edges):
+    low, high, edges = low - edges[0], high - edges[0], edges - edges[0]
+    width = high - low
+    flat = width <= 0
+
+    # A bar's volume density starts at its low and stops at its high, the volume below an edge is then the density
+    # running at each breakpoint times the distance past it: edge * sum(density) - sum(density * breakpoint)
+    density = volume[~flat] / width[~flat]
+    points = np.concatenate([low[~flat], high[~flat]])
+    slopes = np.concatenate([density, -density])
+    order = np.argsort(points, kind='stable')
+    points, slopes = points[order], slopes[order]
+
+    density_sum = np.concatenate([[0], np.cumsum(slopes)])
+    first_moment = np.concatenate([[0], np.cumsum(slopes * points)])
+    second_moment = np.concatenate([[0], np.cumsum(slopes * points ** 2)])
+    passed = np.searchsorted(points, edges, side='right')
+
+    volume_below = edges * density_sum[passed] - first_moment[passed]
+    price_volume_below = (edges ** 2 * density_sum[passed] - second_moment[passed]) / 2
+
+    # Bars without a range keep all their volume at one price
+    order = np.argsort(low[flat], kind='stable')
+    flat_price, flat_volume = low[flat][order], volume[flat][order]
+    passed = np.searchsorted(flat_price, edges, side='right')
+    volume_below += np.concatenate([[0], np.cumsum(flat_volume)])[passed]
+    price_volume_below += np.concatenate([[0], np.cumsum(flat_volume * flat_price)])[passed]
+
+    return volume_below, price_volume_below
+
+# Calculates basic volume profile by splitting prices into bins and finding total volume for each bin. Each bar's volume
+# goes to the bin of its close, or with distribute spreads evenly across every bin its High to Low range covers
+def get_volume_profile(ohlc_df, num_bins=50, distribute=False):
+    volume = np.nan_to_num(ohlc_df['Volume'].to_numpy(dtype=float))
+
+    if distribute:
+        low, high = ohlc_df['Low'].to_numpy(dtype=float), ohlc_df['High'].to_numpy(dtype=float)
+        valid = ~(np.isnan(low) | np.isnan(high))
+        low, high, volume = low[valid], high[valid], volume[valid]
+        edges = get_price_bins(low.min(), high.max(), num_bins)
+
+        # Volume in each bin and its average price, weighted by how the volume spreads over the bin
+        volume_below, price_volume_below = get_range_distribution(low, high, volume, edges)
+        total_volume = np.diff(volume_below)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = edges[0] + np.diff(price_volume_below) / total_volume
+
+        # Without any volume every bin is kept empty at its midpoint, so the profile still covers the price range
+        if total_volume.any():
+            keep = total_volume > 0
+        else:
+            avg_price = (edges[:-1] + edges[1:]) / 2
+            keep = np.ones(num_bins, dtype=bool)
+    else:
+        close = ohlc_df['Close'].to_numpy(dtype=float)
+        valid = ~np.isnan(close)
+        close, volume = close[valid], volume[valid]
+        edges = get_price_bins(close.min(), close.max(), num_bins)
+
+        # Bins include their upper edge like pd.cut, so each close goes to the first bin whose upper edge isn't below it
+        bin_idx = np.clip(np.searchsorted(edges, close, side='left') - 1, 0, num_bins - 1)
+        counts = np.bincount(bin_idx, minlength=num_bins)
+        total_volume = np.bincount(bin_idx, weights=volume, minlength=num_bins)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_price = np.bincount(bin_idx, weights=close, minlength=num_bins) / counts
+        keep = counts > 0
+
+    return pd.DataFrame({'Price Bin': pd.arrays.IntervalArray.from_breaks(edges)[keep],
+                         'Total Volume': total_volume[keep],
+                         'Avg Price': avg_price[keep]})
 
 # Determines the point of control, value area, and high volume nodes
 def get_profile_info(profile_df):
-    df = profile_df.copy().sort_values('Avg Price').reset_index(drop=True)
+    df = profile_df.sort_values('Avg Price').reset_index(drop=True)
+    volume = df['Total Volume'].to_numpy(dtype=float)
+    price = df['Avg Price'].to_numpy(dtype=float)
+
+    # Without any volume there is no POC or value area to find
+    if not volume.sum() > 0:
+        return {'POC': None,
+                'Value Area High': None,
+                'Value Area Low': None,
+                'High Volume Nodes': []}
 
     # Determing POC info
-    poc_idx = df['Total Volume'].idxmax()
-    poc_price = df['Avg Price'].iloc[poc_idx]
-    
-    # Variables needed for value area algorithm
-    target_volume = df['Total Volume'].sum() * 0.7
-    cumulative_volume = df['Total Volume'].iloc[poc_idx]
-    above_idx = poc_idx + 1
-    below_idx = poc_idx - 1
-
-    # Algorithm to find value area, aka the smallest continuous price range that contains 70% of the volume
-    while cumulative_volume < target_volume:
-        # Determine volume above and below
-        above_vol = df['Total Volume'].iloc[above_idx] if above_idx < len(df) else 0
-        below_vol = df['Total Volume'].iloc[below_idx] if below_idx >= 0 else 0
-
-        # Expand cumulative towards the larger volume
-        if above_vol >= below_vol and above_idx < len(df):
-            cumulative_volume += above_vol
-            above_idx += 1
-        elif below_idx >= 0:
-            cumulative_volume += below_vol
-            below_idx -= 1
-        else:
-            break 
+    poc_idx = int(np.argmax(volume))
+    poc_price = price[poc_idx]
+
+    # Value area, aka the smallest continuous price range around the POC that contains 70% of the volume. With prefix
+    # sums the volume of any range is one subtraction, so each range starting at or below the POC finds the first bin
+    # it can end at with one binary search
+    cumulative = np.concatenate([[0], np.cumsum(volume)])
+    starts = np.arange(poc_idx + 1)
+    ends = np.maximum(np.searchsorted(cumulative, cumulative[starts] + cumulative[-1] * 0.7, side='left') - 1, poc_idx)
+
+    # Ranges starting too high run out of bins before reaching 70%, the one starting at the first bin always fits
+    fits = ends < len(volume)
+    starts, ends = starts[fits], ends[fits]
+
+    # Narrowest range wins, ties going to the one holding more volume
+    best = np.lexsort((cumulative[starts] - cumulative[ends + 1], price[ends] - price[starts]))[0]
 
     # Value area price bounds 
-    value_area_high = df['Avg Price'].iloc[above_idx - 1]
-    value_area_low = df['Avg Price'].iloc[below_idx + 1]
+    value_area_high = price[ends[best]]
+    value_area_low = price[starts[best]]
 
     high_volume_nodes = df.nlargest(5, 'Total Volume')['Avg Price'].tolist()
 
@@ -145,12 +224,16 @@ def get_profile_info(profile_df):
 Rolling Realized Volatility
 """
 
+# Determines the rolling window length for a number of rows: 10% of the data, at least 10 rows
+def get_rolling_window(length):
+    return max(10, int(length * 0.1))
+
 # Determines rolling realized volatility of close prices
 def get_realized_volatility(ohlc_df, interval):
     df = ohlc_df.copy()
 
     # Calculates rolling window, minimum 10, maximum of 10% of total data length, and then returns and rolling std
-    window = max(10, int(len(df) * 0.1))
+    window = get_rolling_window(len(df))
     df['% Returns'] = df['Close'].pct_change()
     rolling_std = df['% Returns'].rolling(window).std()
 
@@ -174,10 +257,81 @@ def get_rolling_beta(ohlc_df, benchmark_df):
     # Calculate returns and rolling window based on length of data 
     combined['Stock Returns'] = combined['Close'].pct_change()
     combined['Benchmark Returns'] = combined['Close_benchmark'].pct_change()
-    window = max(10, int(len(combined) * 0.1))
+    window = get_rolling_window(len(combined))
 
     # Calculating rolling beta, beta = cov(stock and market) / var 
     rolling_beta = (combined['Stock Returns'].rolling(window).cov(combined['Benchmark Returns']) / 
                     combined['Benchmark Returns'].rolling(window).var())
     
-    return rolling_beta.dropna()
\ No newline at end of file
+    return rolling_beta.dropna()
+
+"""
+Portfolio Risk
+"""
+
+# Sums every column of a matrix over a trailing window using one cumulative sum, windows with any missing value are NaN
+# the way a pandas rolling window of that length is
+def get_rolling_sums(values, valid, window):
+    if len(values) < window:
+        return np.full(values.shape, np.nan)
+
+    complete = valid.all()
+    cumulative = np.cumsum(values if complete else np.where(valid, values, 0), axis=0)
+
+    sums = np.empty_like(cumulative)
+    sums[:window - 1] = np.nan
+    sums[window - 1] = cumulative[window - 1]
+    sums[window:] = cumulative[window:] - cumulative[:-window]
+    if complete:
+        return sums
+
+    counts = np.cumsum(valid, axis=0)
+    counts[window:] = counts[window:] - counts[:-window]
+    return np.where(counts == window, sums, np.nan)
+
+# Gets the returns of every column of a close panel, a missing close leaves both returns around it missing
+def get_panel_returns(close_df):
+    closes = close_df.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[1:] / closes[:-1] - 1
+
+# Determines rolling realized volatility of every column of a close panel at once, e.g. a whole portfolio from
+# get_close_data, with the same window and annualization as get_realized_volatility
+def get_panel_volatility(close_df, interval):
+    values = get_panel_returns(close_df)
+    window = get_rolling_window(len(close_df))
+
+    # Sample variance from the window's sum and sum of squares
+    valid = np.isfinite(values)
+    sums = get_rolling_sums(values, valid, window)
+    squares = get_rolling_sums(values ** 2, valid, window)
+    variance = (squares - sums ** 2 / window) / (window - 1)
+
+    factor = annualization_factors.get(interval)
+    volatility = pd.DataFrame(np.sqrt(np.maximum(variance, 0)) * factor, index=close_df.index[1:],
+                              columns=close_df.columns)
+
+    return volatility.dropna(how='all')
+
+# Determines the rolling beta of every column of a close panel to the SMP 500 benchmark at once, with the same window
+# as get_rolling_beta
+def get_panel_beta(close_df, benchmark_df):
+    combined = close_df.join(benchmark_df['Close'].rename('Benchmark'), how='inner')
+    returns = get_panel_returns(combined)
+    window = get_rolling_window(len(combined))
+
+    # Each column is paired with the benchmark, a window only counts when both have every return in it
+    values, benchmark = returns[:, :-1], returns[:, -1:]
+    valid = np.isfinite(values) & np.isfinite(benchmark)
+    benchmark = np.broadcast_to(benchmark, values.shape)
+
+    # beta = cov(stock and market) / var, both from window sums, their shared 1 / (window - 1) cancels
+    stock_sums = get_rolling_sums(values, valid, window)
+    benchmark_sums = get_rolling_sums(benchmark, valid, window)
+    covariance = get_rolling_sums(values * benchmark, valid, window) - stock_sums * benchmark_sums / window
+    variance = get_rolling_sums(benchmark ** 2, valid, window) - benchmark_sums ** 2 / window
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = covariance / variance
+
+    return pd.DataFrame(beta, index=combined.index[1:], columns=close_df.columns).dropna(how='all')
@@ -0,0 +1,81 @@
+import threading
+import time
+import traceback
+from utils import data
+from utils.config import market_map, sector_map, valid_intervals_map, period_map, interval_map, PROVIDER_BURST
+from utils.market_hours import get_cache_ttl
+from cache_config import cache
+
+# Symbols every visitor of the market and sector pages asks for
+warm_symbols = list(market_map) + list(sector_map)
+
+# Seconds before expiry a warm entry gets refreshed, and how long past expiry it may still be served while that happens
+REFRESH_LEAD = 120
+STALE_GRACE = 300
+
+# How often the warmer wakes up to look for entries due a refresh
+CHECK_INTERVAL = 15
+
+# Symbols refreshed per download, small enough to fit in the tokens background refreshes may use
+WARM_BATCH = max(1, PROVIDER_BURST - data.BACKGROUND_RESERVE)
+
+_thread = None
+
+# Gets every (fetch period, base interval) pair behind the period and interval dropdowns, each one is a separate cache entry
+def get_warm_keys():
+    keys = set()
+    for period, intervals in valid_intervals_map.items():
+        period_code = period_map[period]
+
+        for interval in intervals:
+            base_code = data.get_base_interval(period_code, interval_map[interval])
+            keys.add((data.get_fetch_period(period_code, base_code), base_code))
+
+    return sorted(keys)
+
+# Refreshes every warm entry that is close to expiring, entries are written with extra lifetime so the
+# old value keeps being served until the new one replaces it. Downloads only use provider tokens users can spare, a
+# pass that runs out stops and is picked up again on a later check, symbols already refreshed are skipped then
+def warm_once(next_refresh):
+    for fetch_period, base_code in get_warm_keys():
+        if time.time() < next_refresh.get((fetch_period, base_code), 0):
+            continue
+
+        # The group is due again when its shortest market hours TTL runs out, overnight that is the next open
+        ttl = min(get_cache_ttl(ticker, base_code) for ticker in warm_symbols)
+        delay = max(CHECK_INTERVAL, ttl - REFRESH_LEAD)
+
+        # Workers sharing a cache take turns, whoever claims the key first does the refresh
+        claim_key = f'cache-warmer:{fetch_period}:{base_code}'
+        if cache.add(claim_key, 1, timeout=delay):
+            try:
+                for i in range(0, len(warm_symbols), WARM_BATCH):
+                    data.refresh_base_ohlc_data(warm_symbols[i:i + WARM_BATCH], fetch_period, base_code,
+                                                lead=REFRESH_LEAD, stale_grace=STALE_GRACE, background=True)
+            except data.RateLimited:
+                # No other group would find spare tokens either, the next check carries on from here
+                cache.delete(claim_key)
+                return
+            except Exception:
+                traceback.print_exc()
+                cache.delete(claim_key)
+                continue
+
+        next_refresh[(fetch_period, base_code)] = time.time() + delay
+
+# Keeps the warm entries fresh until the stop event is set
+def run_warmer(stop_event):
+    next_refresh = {}
+    while not stop_event.is_set():
+        warm_once(next_refresh)
+        stop_event.wait(CHECK_INTERVAL)
+
+# Starts the warmer on a daemon thread, once per process
+def start_cache_warmer():
+    global _thread
+    if _thread is not None:
+        return _thread
+
+    _thread = threading.Thread(target=run_warmer, args=(threading.Event(),), name='cache-warmer', daemon=True)
+    _thread.start()
+    return _thread